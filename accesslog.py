@@ -0,0 +1,157 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, json, queue, threading, time
+
+# environ key the views set to the file or folder a request resolved to
+PATH = "fileserver.path"
+
+
+class AccessLog:
+    # one json line per request, written by a background thread; requests only
+    # put a record on a bounded queue and records are dropped rather than wait
+    # when the disk falls behind. The log is rotated to .1 ... .`backups` once
+    # it is over `max_bytes`
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        backups: int = 5,
+        pending: int = 10000,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+
+        self._queue = queue.Queue(pending)
+        self._file = None
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._thread = threading.Thread(target=self.run, name="AccessLog", daemon=True)
+        self._thread.start()
+
+    def log(self, record: dict):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                self.write(record)
+                if self._queue.empty():
+                    self._file.flush()
+            except OSError:
+                self.dropped += 1
+
+        if self._file:
+            self._file.close()
+
+    def write(self, record: dict):
+        if not self._file:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        if self._file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self._file.close()
+        self._file = None
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self, timeout: float = 5):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def middleware(self, app):
+        def logged(environ, start_response):
+            record = dict(
+                time=time.time(),
+                client=environ.get("REMOTE_ADDR", ""),
+                method=environ.get("REQUEST_METHOD", ""),
+                route=environ.get("PATH_INFO", ""),
+                query=environ.get("QUERY_STRING", ""),
+                range=environ.get("HTTP_RANGE", ""),
+                encoding=environ.get("HTTP_ACCEPT_ENCODING", ""),
+                agent=environ.get("HTTP_USER_AGENT", ""),
+            )
+
+            def start(status, headers, exc_info=None):
+                record["status"] = int(status.split(" ", 1)[0])
+                return start_response(status, headers, exc_info)
+
+            try:
+                body = app(environ, start)
+            except BaseException:
+                record["status"] = 500
+                self.finish(record, environ, 0)
+                raise
+            return Logged(self, body, record, environ)
+
+        return logged
+
+    def finish(self, record: dict, environ: dict, sent: int, error=""):
+        record["path"] = environ.get(PATH, "")
+        record["bytes"] = sent
+        record["duration"] = round(time.time() - record["time"], 6)
+        if error:
+            record["error"] = error
+        self.log(record)
+
+
+class Logged:
+    # counts the bytes of a response body and logs the request once the body
+    # is closed, so the duration covers the whole transfer
+    def __init__(self, log: AccessLog, iterable, record: dict, environ: dict):
+        self.log = log
+        self.iterable = iterable
+        self.record = record
+        self.environ = environ
+        self.sent = 0
+        self.error = ""
+
+    def __iter__(self):
+        try:
+            for chunk in self.iterable:
+                self.sent += len(chunk)
+                yield chunk
+        except BaseException as e:
+            self.error = repr(e)
+            raise
+
+    def close(self):
+        try:
+            if hasattr(self.iterable, "close"):
+                self.iterable.close()
+        finally:
+            self.log.finish(self.record, self.environ, self.sent, self.error)
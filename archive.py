@@ -0,0 +1,254 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, hashlib, json, shutil, threading, time, uuid
+from exclude import Exclusions
+from zipwriter import ZipWriter
+import utils
+
+
+def walk(folder: str, exclusions: Exclusions = None):
+    return utils.walk(folder, exclusions or Exclusions())
+
+
+def scan(folder: str, exclusions: Exclusions = None):
+    # totals used for the progress and ETA of an archive job
+    count = size = 0
+    if os.path.isdir(folder):
+        for entry, _ in walk(folder, exclusions):
+            try:
+                size += entry.stat().st_size
+            except OSError:
+                continue
+            count += 1
+    else:
+        count, size = 1, os.path.getsize(folder)
+    return count, size
+
+
+def zip(
+    folder: str,
+    cache: "ArchiveCache",
+    latest=False,
+    progress=None,
+    exclusions: Exclusions = None,
+) -> str:
+    zipFileName = cache.get(folder)
+    if zipFileName and not latest:
+        return zipFileName
+    print(f"Zipping {folder}")
+
+    done = size = 0
+    base = os.path.basename(folder)
+    temp = cache.temp(folder)
+
+    # Create zip file, memory stays flat however many files the folder has
+    try:
+        with ZipWriter(temp) as zipFile:
+            if os.path.isdir(folder):
+                for entry, rel in walk(folder, exclusions):
+                    st = entry.stat()
+                    zipFile.write(entry.path, f"{base}/{rel}", st)
+
+                    if progress:
+                        done += 1
+                        size += st.st_size
+                        progress(done, size)
+            else:
+                zipFile.write(folder, base)
+    except BaseException:
+        os.remove(temp)
+        raise
+    return cache.publish(folder, temp)
+
+
+class ArchiveCache:
+    # zips are built into their own folder of the cache, one sub folder per
+    # source with the zip and a meta.json, and are published with an atomic
+    # rename; the least recently (lru) or least frequently (lfu) used zips are
+    # removed once the cache grows over the budget; the use counts of cache
+    # hits are written to meta.json at most every `save_delay` seconds
+    def __init__(
+        self,
+        folder: str,
+        budget: int = 4 * 1024 * 1024 * 1024,
+        policy: str = "lru",
+        save_delay: float = 5,
+    ):
+        self.folder = folder
+        self.budget = budget
+        self.policy = policy
+        self.save_delay = save_delay
+        self.used = 0
+        self._entries = {}
+        self._dirty = set()
+        self._timer = None
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self.recover()
+
+    def key(self, source: str) -> str:
+        return hashlib.sha1(os.path.abspath(source).encode()).hexdigest()[:16]
+
+    def target(self, source: str) -> str:
+        name = os.path.basename(os.path.abspath(source)) or "root"
+        return os.path.join(self.folder, self.key(source), f"{name}.zip")
+
+    def temp(self, source: str) -> str:
+        target = self.target(source)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        return f"{target}.{uuid.uuid4().hex[:8]}.tmp"
+
+    def get(self, source: str) -> str:
+        key = self.key(source)
+        with self._lock:
+            meta = self._entries.get(key)
+            if not meta or not os.path.isfile(meta["path"]):
+                return None
+            meta["last"] = time.time()
+            meta["hits"] += 1
+            self._dirty.add(key)
+            if not self._timer:
+                self._timer = threading.Timer(self.save_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return meta["path"]
+
+    def publish(self, source: str, temp: str) -> str:
+        target = self.target(source)
+        os.replace(temp, target)
+
+        key = self.key(source)
+        meta = dict(
+            path=target,
+            source=os.path.abspath(source),
+            size=os.path.getsize(target),
+            built=time.time(),
+            last=time.time(),
+            hits=0,
+        )
+        with self._lock:
+            old = self._entries.get(key)
+            if old:
+                self.used -= old["size"]
+                meta["hits"] = old["hits"]
+            self._entries[key] = meta
+            self.used += meta["size"]
+            self._dirty.discard(key)
+        self.save(key, dict(meta))
+        self.evict(keep=key)
+        return target
+
+    def flush(self):
+        with self._lock:
+            self._timer = None
+            dirty = [
+                (key, dict(self._entries[key]))
+                for key in self._dirty
+                if key in self._entries
+            ]
+            self._dirty.clear()
+        for key, meta in dirty:
+            self.save(key, meta)
+
+    def save(self, key: str, meta: dict):
+        # concurrent saves write their own temporary files
+        path = os.path.join(self.folder, key, "meta.json")
+        temp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(temp, "w") as file:
+                json.dump(meta, file)
+            os.replace(temp, path)
+        except OSError:
+            # the zip was evicted meanwhile
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    def evict(self, keep: str = ""):
+        with self._lock:
+            if self.used <= self.budget:
+                return
+            if self.policy == "lfu":
+                order = lambda item: (item[1]["hits"], item[1]["last"])
+            else:
+                order = lambda item: item[1]["last"]
+            removed = []
+            for key, meta in sorted(self._entries.items(), key=order):
+                if self.used <= self.budget:
+                    break
+                if key == keep:
+                    continue
+                self.used -= meta["size"]
+                removed.append(key)
+            for key in removed:
+                del self._entries[key]
+
+        # a zip still being sent stays readable until it is closed
+        for key in removed:
+            shutil.rmtree(os.path.join(self.folder, key), ignore_errors=True)
+
+    def recover(self, stale: float = 3600):
+        # rebuilds the index from the cache folder, dropping unfinished builds;
+        # temporary files written in the last `stale` seconds may belong to
+        # another server sharing the cache and are left alone
+        now = time.time()
+        for entry in os.scandir(self.folder):
+            if not entry.is_dir():
+                continue
+
+            meta = None
+            zips = []
+            busy = False
+            for file in os.scandir(entry.path):
+                if file.name.endswith(".tmp"):
+                    try:
+                        if now - file.stat().st_mtime < stale:
+                            busy = True
+                        else:
+                            os.remove(file.path)
+                    except OSError:
+                        pass
+                elif file.name.endswith(".zip"):
+                    zips.append(file)
+            try:
+                with open(os.path.join(entry.path, "meta.json")) as file:
+                    meta = json.load(file)
+            except (OSError, ValueError):
+                pass
+
+            if not zips:
+                if not busy:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            st = zips[0].stat()
+            if not meta or meta.get("path") != zips[0].path:
+                meta = dict(
+                    path=zips[0].path,
+                    source="",
+                    built=st.st_mtime,
+                    last=st.st_mtime,
+                    hits=0,
+                )
+            meta["size"] = st.st_size
+            self._entries[entry.name] = meta
+            self.used += st.st_size
+        self.evict()
@@ -0,0 +1,192 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, mmap, mimetypes, threading, time, collections
+
+
+def etag(st: os.stat_result) -> str:
+    # the validator of a file version, cheap and the same however it is sent
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+class Entry:
+    def __init__(self, path: str, st: os.stat_result, data):
+        self.path = path
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        self.mtime_ns = st.st_mtime_ns
+        self.etag = etag(st)
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        # bytes for small files, a read only mmap for larger ones
+        self.data = data
+        self.checked = time.monotonic()
+
+    @property
+    def mapped(self) -> bool:
+        return isinstance(self.data, mmap.mmap)
+
+    def open(self) -> "View":
+        return View(self.data)
+
+
+class View:
+    # a file like reader with its own position, so concurrent responses can
+    # share one buffer; slicing bytes or a mmap needs no read syscalls
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self.data) if size < 0 else self.pos + size
+        chunk = self.data[self.pos : end]
+        self.pos += len(chunk)
+        return chunk
+
+    def seek(self, pos: int, whence: int = 0) -> int:
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += len(self.data)
+        self.pos = pos
+        return pos
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+
+class FileCache:
+    # keeps hot files in memory: files up to `max_object` bytes are read into
+    # a LRU bounded by `budget` bytes, files up to `mmap_max` bytes are mapped
+    # once they were requested `mmap_hits` times; entries are checked against
+    # the file size and mtime at most every `revalidate` seconds
+    def __init__(
+        self,
+        budget: int = 64 * 1024 * 1024,
+        max_object: int = 1024 * 1024,
+        mmap_budget: int = 1024 * 1024 * 1024,
+        mmap_max: int = 256 * 1024 * 1024,
+        mmap_hits: int = 2,
+        revalidate: float = 1,
+    ):
+        self.budget = budget
+        self.max_object = max_object
+        self.mmap_budget = mmap_budget
+        self.mmap_max = mmap_max
+        self.mmap_hits = mmap_hits
+        self.revalidate = revalidate
+
+        self._memory = collections.OrderedDict()
+        self._mapped = collections.OrderedDict()
+        self._hits = collections.OrderedDict()
+        self._used = self._mapped_used = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Entry:
+        if self.budget <= 0:
+            return None
+
+        with self._lock:
+            entry = self._memory.get(path) or self._mapped.get(path)
+            if entry and time.monotonic() - entry.checked < self.revalidate:
+                self.touch(entry)
+                return entry
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.discard(path)
+            return None
+
+        with self._lock:
+            if entry and (entry.size, entry.mtime_ns) == (st.st_size, st.st_mtime_ns):
+                entry.checked = time.monotonic()
+                self.touch(entry)
+                return entry
+
+        self.discard(path)
+        if st.st_size <= self.max_object:
+            return self.load(path, st)
+        if st.st_size <= self.mmap_max and self.hit(path) >= self.mmap_hits:
+            return self.map(path, st)
+        return None
+
+    def touch(self, entry: Entry):
+        entries = self._mapped if entry.mapped else self._memory
+        if entry.path in entries:
+            entries.move_to_end(entry.path)
+
+    def hit(self, path: str) -> int:
+        # remembers how often recent uncached files were asked for
+        with self._lock:
+            hits = self._hits.pop(path, 0) + 1
+            self._hits[path] = hits
+            while len(self._hits) > 4096:
+                self._hits.popitem(last=False)
+            return hits
+
+    def load(self, path: str, st: os.stat_result) -> Entry:
+        with open(path, "rb") as file:
+            data = file.read()
+        if len(data) != st.st_size:
+            # changed while reading
+            return None
+
+        entry = Entry(path, st, data)
+        with self._lock:
+            self._memory[path] = entry
+            self._used += entry.size
+            while self._used > self.budget and self._memory:
+                _, old = self._memory.popitem(last=False)
+                self._used -= old.size
+        return entry
+
+    def map(self, path: str, st: os.stat_result) -> Entry:
+        if not st.st_size:
+            return None
+        with open(path, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        entry = Entry(path, st, data)
+        with self._lock:
+            self._hits.pop(path, None)
+            self._mapped[path] = entry
+            self._mapped_used += entry.size
+            while self._mapped_used > self.mmap_budget and self._mapped:
+                # a mapping is unmapped once the responses using it are done
+                _, old = self._mapped.popitem(last=False)
+                self._mapped_used -= old.size
+        return entry
+
+    def discard(self, path: str):
+        with self._lock:
+            entry = self._memory.pop(path, None)
+            if entry:
+                self._used -= entry.size
+            entry = self._mapped.pop(path, None)
+            if entry:
+                self._mapped_used -= entry.size
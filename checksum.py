@@ -0,0 +1,144 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, json, hashlib, zlib, threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+CHUNK = 1024 * 1024
+
+
+class Checksums:
+    # sha256 and crc32 digests of files, persisted in a json file and keyed by
+    # inode, size and mtime so a changed file is hashed again
+    def __init__(
+        self,
+        path: str,
+        workers: int = 2,
+        entries: int = 100000,
+        save_delay: float = 5,
+        backlog: int = 1000,
+    ):
+        self.path = path
+        self.entries = entries
+        self.save_delay = save_delay
+        # files queued by prefetch at most, so big trees are hashed in batches
+        self.backlog = backlog
+        self.pool = ThreadPoolExecutor(workers, "Checksums")
+
+        self._digests: dict = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        self.load()
+
+    def key(self, path: str, st: os.stat_result) -> str:
+        # some filesystems have no inode numbers
+        return f"{st.st_ino or path}:{st.st_size}:{st.st_mtime_ns}"
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                self._digests = json.load(file)
+        except (OSError, ValueError):
+            self._digests = {}
+
+    def save(self):
+        with self._lock:
+            self._timer = None
+            digests = dict(self._digests)
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp = f"{self.path}.tmp"
+        with open(temp, "w") as file:
+            json.dump(digests, file)
+        os.replace(temp, self.path)
+
+    def lookup(self, path: str) -> dict:
+        # never hashes, returns None when the digests are not known yet
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return self._digests.get(self.key(path, st))
+
+    def get(self, path: str, wait: float = 0) -> dict:
+        digests = self.lookup(path)
+        if digests:
+            return digests
+
+        future = self.schedule(path)
+        try:
+            return future.result(wait) if wait else None
+        except TimeoutError:
+            return None
+
+    def now(self, path: str) -> dict:
+        # hashes in the calling thread when the digests are not known yet
+        st = os.stat(path)
+        return self.lookup(path) or self.compute(path, self.key(path, st))
+
+    def schedule(self, path: str):
+        st = os.stat(path)
+        key = self.key(path, st)
+        with self._lock:
+            future = self._pending.get(key)
+            if not future:
+                future = self.pool.submit(self.compute, path, key)
+                self._pending[key] = future
+            return future
+
+    def prefetch(self, path: str) -> bool:
+        # schedules the hashing only while the queue is short
+        if len(self._pending) >= self.backlog:
+            return False
+        self.schedule(path)
+        return True
+
+    def compute(self, path: str, key: str) -> dict:
+        try:
+            sha256 = hashlib.sha256()
+            crc = 0
+            with open(path, "rb") as file:
+                while True:
+                    chunk = file.read(CHUNK)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    crc = zlib.crc32(chunk, crc)
+
+            digests = dict(sha256=sha256.hexdigest(), crc32=f"{crc:08x}")
+            if self.key(path, os.stat(path)) != key:
+                # changed while hashing
+                return None
+
+            with self._lock:
+                self._digests[key] = digests
+                while len(self._digests) > self.entries:
+                    del self._digests[next(iter(self._digests))]
+                if not self._timer:
+                    self._timer = threading.Timer(self.save_delay, self.save)
+                    self._timer.daemon = True
+                    self._timer.start()
+            return digests
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
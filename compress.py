@@ -0,0 +1,187 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, zlib, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import prune
+
+try:
+    import brotli
+except ImportError:
+    # br is only offered when brotli is installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    # zstd is only offered when zstandard is installed
+    zstandard = None
+
+TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/x-yaml",
+    "image/svg+xml",
+)
+EXTENSIONS = {"br": ".br", "zstd": ".zst", "gzip": ".gz"}
+
+
+def encodings() -> list:
+    # the available encodings, best first
+    return [
+        encoding
+        for encoding, available in [
+            ("br", brotli),
+            ("zstd", zstandard),
+            ("gzip", True),
+        ]
+        if available
+    ]
+
+
+def compressible(mimetype: str) -> bool:
+    return bool(mimetype) and mimetype.startswith(TYPES)
+
+
+def negotiate(accept) -> str:
+    # the encoding the client likes most, ties go to the better one
+    best, quality = None, 0
+    for encoding in encodings():
+        q = accept[encoding]
+        if q > quality:
+            best, quality = encoding, q
+    return best
+
+
+class Compressor:
+    # one streaming compressor behind the zlib compress/flush interface
+    def __init__(self, encoding: str, level: int = 0):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=level or 5)
+            self.compress = self._compressor.process
+            self.flush = self._compressor.finish
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level or 3).compressobj()
+            self.compress = self._compressor.compress
+            self.flush = self._compressor.flush
+        else:
+            # wbits 31 writes the gzip header and trailer
+            self._compressor = zlib.compressobj(level or 6, zlib.DEFLATED, 31)
+            self.compress = self._compressor.compress
+            self.flush = self._compressor.flush
+
+
+def stream(chunks, encoding: str, level: int = 0):
+    compressor = Compressor(encoding, level)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def compress(data: bytes, encoding: str, level: int = 0) -> bytes:
+    compressor = Compressor(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+class Sidecars:
+    # compressed copies of text files at the best level, keyed by path, mtime
+    # and size; they are made in the background after a file was sent
+    # compressed on the fly, and the least recently used are removed once the
+    # folder grows over the budget
+    LEVELS = {"br": 11, "zstd": 19, "gzip": 9}
+
+    def __init__(
+        self,
+        folder: str,
+        budget: int = 256 * 1024 * 1024,
+        max_size: int = 32 * 1024 * 1024,
+        workers: int = 1,
+    ):
+        self.folder = folder
+        self.budget = budget
+        # bigger files are always compressed on the fly
+        self.max_size = max_size
+        self.pool = ThreadPoolExecutor(workers, "Sidecars")
+
+        self._pending = set()
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self.used = prune(folder, budget)
+
+    def key(self, path: str, st: os.stat_result, encoding: str) -> str:
+        key = f"{path}\0{st.st_mtime_ns}\0{st.st_size}\0{encoding}"
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, path: str, st: os.stat_result, encoding: str) -> str:
+        if st.st_size > self.max_size:
+            return None
+        target = os.path.join(
+            self.folder, self.key(path, st, encoding) + EXTENSIONS[encoding]
+        )
+        if os.path.isfile(target):
+            os.utime(target)
+            return target
+
+        with self._lock:
+            if target not in self._pending:
+                self._pending.add(target)
+                self.pool.submit(self.make, path, st, target, encoding)
+        return None
+
+    def make(self, path: str, st: os.stat_result, target: str, encoding: str):
+        temp = f"{target}.{threading.get_ident()}.tmp"
+        try:
+            compressor = Compressor(encoding, self.LEVELS[encoding])
+            with open(path, "rb") as source, open(temp, "wb") as file:
+                for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                    file.write(compressor.compress(chunk))
+                file.write(compressor.flush())
+
+            now = os.stat(path)
+            if (now.st_mtime_ns, now.st_size) != (st.st_mtime_ns, st.st_size):
+                # changed while compressing, the next request tries again
+                os.remove(temp)
+                return
+            os.replace(temp, target)
+
+            with self._lock:
+                self.used += os.path.getsize(target)
+                if self.used > self.budget:
+                    self.used = prune(self.folder, self.budget)
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+        finally:
+            with self._lock:
+                self._pending.discard(target)
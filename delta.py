@@ -0,0 +1,368 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Block signatures of served files and a client that rebuilds a new version
+# of a file from an old local copy, downloading only the blocks it lacks.
+#
+#   python delta.py "http://host:7767/file?path=..." old.img new.img
+
+import os, json, zlib, hashlib, threading, argparse, mmap
+import http.client, urllib.parse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from utils import prune
+
+# imported by load_numpy on the first search, the server only needs the
+# signatures of this module and starts without it
+numpy = False
+
+MOD = 65521
+# bytes of the old file rolled over in pure Python, the blocks not found by
+# then are downloaded
+ROLL = 1024 * 1024
+# offsets hashed at once with numpy
+WINDOW = 1024 * 1024
+
+
+def block_size(size: int) -> int:
+    # about the square root of the size, a power of two from 4 KB to 1 MB
+    return 1 << max(12, min(20, int(size**0.5).bit_length()))
+
+
+def strong(data) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def signatures(path: str, block: int) -> list:
+    blocks = []
+    with open(path, "rb") as file:
+        while True:
+            data = file.read(block)
+            if not data:
+                break
+            blocks.append([zlib.adler32(data), strong(data)])
+    return blocks
+
+
+class Signatures:
+    # block signatures cached on disk per file path, size, mtime and block
+    # size, computed in a background pool
+    def __init__(self, folder: str, workers: int = 2, budget: int = 256 * 1024 * 1024):
+        self.folder = folder
+        self.budget = budget
+        self.pool = ThreadPoolExecutor(workers, "Signatures")
+        self._pending = {}
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def target(self, path: str, block: int) -> str:
+        st = os.stat(path)
+        key = f"{path}\0{st.st_size}\0{st.st_mtime_ns}\0{block}"
+        return os.path.join(self.folder, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, path: str, block: int = 0, wait: float = 0) -> dict:
+        block = block or block_size(os.path.getsize(path))
+        target = self.target(path, block)
+        try:
+            with open(target) as file:
+                os.utime(target)
+                return json.load(file)
+        except (OSError, ValueError):
+            pass
+
+        with self._lock:
+            future = self._pending.get(target)
+            if not future:
+                future = self.pool.submit(self.compute, path, block, target)
+                self._pending[target] = future
+        try:
+            return future.result(wait) if wait else None
+        except TimeoutError:
+            return None
+
+    def compute(self, path: str, block: int, target: str) -> dict:
+        try:
+            result = dict(
+                size=os.path.getsize(path),
+                block=block,
+                blocks=signatures(path, block),
+            )
+            if self.target(path, block) != target:
+                # changed while reading
+                return None
+
+            temp = f"{target}.tmp"
+            with open(temp, "w") as file:
+                json.dump(result, file)
+            os.replace(temp, target)
+            prune(self.folder, self.budget)
+            return result
+        finally:
+            with self._lock:
+                self._pending.pop(target, None)
+
+
+def load_numpy():
+    global numpy
+    if numpy is False:
+        try:
+            import numpy as module
+        except ImportError:
+            # moved blocks are looked for in pure Python, over a limited span
+            module = None
+        numpy = module
+    return numpy
+
+
+def rolling(data, block: int, start: int, stop: int):
+    # the adler32 of the blocks at every offset from start to stop, from the
+    # cumulative sums of the bytes and of the bytes times their offsets
+    x = numpy.frombuffer(data, numpy.uint8, stop - start + block - 1, start)
+    x = x.astype(numpy.int64)
+    sums = numpy.zeros(len(x) + 1, numpy.int64)
+    numpy.cumsum(x, out=sums[1:])
+    weighted = numpy.zeros(len(x) + 1, numpy.int64)
+    numpy.cumsum(x * numpy.arange(len(x)), out=weighted[1:])
+
+    total = sums[block:] - sums[:-block]
+    a = (1 + total) % MOD
+    ends = numpy.arange(block, len(x) + 1, dtype=numpy.int64)
+    b = (block + ends * total - (weighted[block:] - weighted[:-block])) % MOD
+    return a, b
+
+
+def candidates(data, block: int, weak: dict):
+    # offsets of the old file whose adler32 is one of the remote blocks; both
+    # halves are first looked up in tables, which is much faster than isin
+    keys = numpy.fromiter(weak, numpy.int64, len(weak))
+    lows = numpy.zeros(1 << 16, bool)
+    lows[keys & 0xFFFF] = True
+    highs = numpy.zeros(1 << 16, bool)
+    highs[keys >> 16] = True
+
+    last = len(data) - block + 1
+    for start in range(0, last, WINDOW):
+        a, b = rolling(data, block, start, min(start + WINDOW, last))
+        for offset in numpy.flatnonzero(lows[a] & highs[b]):
+            value = int(b[offset]) << 16 | int(a[offset])
+            if value in weak:
+                yield start + int(offset), value
+
+
+def scan(data, block: int, weak: dict, roll: int = ROLL):
+    # the same in pure Python over `roll` bytes at most, a matched block is
+    # followed by a check of the next one instead of rolling over it
+    length = len(data)
+    pos = rolled = 0
+    fresh = True
+    while pos + block <= length and rolled < roll:
+        if fresh:
+            value = zlib.adler32(data[pos : pos + block])
+            a, b = value & 0xFFFF, value >> 16
+            fresh = False
+        value = (b << 16) | a
+        if value in weak:
+            matched = yield pos, value
+            if matched:
+                pos += block
+                fresh = True
+                continue
+
+        if pos + block >= length:
+            break
+        out, into = data[pos], data[pos + block]
+        a = (a - out + into) % MOD
+        b = (b - block * out + a - 1) % MOD
+        pos += 1
+        rolled += 1
+
+
+def match(old: str, size: int, block: int, blocks: list) -> dict:
+    # maps remote block indexes to offsets of equal blocks in the old file
+    found = {}
+    if not os.path.isfile(old) or not os.path.getsize(old):
+        return found
+
+    weak = {}
+    for i, (w, _) in enumerate(blocks):
+        weak.setdefault(w, []).append(i)
+
+    with open(old, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    with data:
+        length = len(data)
+
+        # unchanged blocks usually stay where they were
+        for i, (w, s) in enumerate(blocks):
+            chunk = data[i * block : (i + 1) * block]
+            if chunk and zlib.adler32(chunk) == w and strong(chunk) == s:
+                found[i] = i * block
+
+        # the last block may be shorter than the others
+        last = len(blocks) - 1
+        tail = size - last * block
+        if last >= 0 and last not in found and length >= tail:
+            chunk = data[length - tail :]
+            if strong(chunk) == blocks[last][1]:
+                found[last] = length - tail
+
+        if len(found) == len(blocks) or length < block:
+            return found
+
+        # blocks that moved: a short scan finds the ones shifted together by
+        # an insert, numpy then looks at every offset for the others
+        fast = load_numpy() is not None
+        searches = [scan(data, block, weak, 16 * block)] if fast else []
+        searches.append(
+            candidates(data, block, weak) if fast else scan(data, block, weak)
+        )
+        taken = set(found.values())
+        for offsets in searches:
+            matched = None
+            try:
+                while len(found) < len(blocks):
+                    pos, value = offsets.send(matched)
+                    matched = pos in taken
+                    indexes = [i for i in weak[value] if i not in found]
+                    if not indexes:
+                        continue
+                    s = strong(data[pos : pos + block])
+                    for i in indexes:
+                        if blocks[i][1] == s:
+                            found[i] = pos
+                            matched = True
+                    if matched:
+                        taken.add(pos)
+            except StopIteration:
+                pass
+            finally:
+                offsets.close()
+    return found
+
+
+class Client:
+    def __init__(self, url: str):
+        self.url = urllib.parse.urlsplit(url)
+        Connection = (
+            http.client.HTTPSConnection
+            if self.url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.connection = Connection(self.url.netloc, timeout=60)
+
+    def get(self, route: str, headers={}, params="") -> http.client.HTTPResponse:
+        url = f"{route}?{self.url.query}{params}"
+        try:
+            self.connection.request("GET", url, headers=headers)
+            return self.connection.getresponse()
+        except (http.client.BadStatusLine, ConnectionError):
+            # the server closed the idle keep alive connection, the request
+            # is sent once more after reconnecting
+            self.connection.close()
+            self.connection.request("GET", url, headers=headers)
+            return self.connection.getresponse()
+
+    def json(self, route: str, params: str = "") -> dict:
+        response = self.get(route, params=params)
+        body = response.read()
+        if response.status != 200:
+            raise OSError(f"{route} : {response.status} {body[:200]!r}")
+        return json.loads(body)
+
+    def range(self, start: int, end: int) -> bytes:
+        response = self.get(self.url.path, {"Range": f"bytes={start}-{end - 1}"})
+        body = response.read()
+        if response.status != 206 or len(body) != end - start:
+            raise OSError(f"range {start}-{end} : {response.status}")
+        return body
+
+
+def sync(url: str, old: str, output: str) -> tuple:
+    client = Client(url)
+    while True:
+        # the signatures of a big file may still be computing
+        response = client.get("/signature")
+        body = response.read()
+        if response.status == 200:
+            signature = json.loads(body)
+            break
+        if response.status != 202:
+            raise OSError(f"/signature : {response.status} {body[:200]!r}")
+        retry = int(response.getheader("Retry-After", "5"))
+        print(f"Waiting {retry}s for the signatures")
+        threading.Event().wait(retry)
+
+    size, block, blocks = signature["size"], signature["block"], signature["blocks"]
+    found = match(old, size, block, blocks)
+
+    fetched = 0
+    temp = f"{output}.part"
+    with open(temp, "wb") as out:
+        source = open(old, "rb") if found else None
+        try:
+            i = 0
+            while i < len(blocks):
+                if i in found:
+                    source.seek(found[i])
+                    out.write(source.read(min(block, size - i * block)))
+                    i += 1
+                    continue
+
+                # consecutive missing blocks are fetched with one request
+                j = i
+                while j < len(blocks) and j not in found:
+                    j += 1
+                start, end = i * block, min(j * block, size)
+                out.write(client.range(start, end))
+                fetched += end - start
+                i = j
+        finally:
+            if source:
+                source.close()
+
+    digests = client.json("/checksum", "&wait=30")
+    sha256 = hashlib.sha256()
+    with open(temp, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    if sha256.hexdigest() != digests["sha256"]:
+        raise OSError("checksum mismatch, the file changed on the server")
+
+    os.replace(temp, output)
+    return len(found), len(blocks), fetched
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Update a local file from a File Server, "
+        "downloading only the blocks that changed."
+    )
+    parser.add_argument("url", help="the /file url of the file on the server")
+    parser.add_argument("old", help="the local copy to reuse blocks from")
+    parser.add_argument("output", nargs="?", help="defaults to replacing old")
+    args = parser.parse_args(args)
+
+    reused, total, fetched = sync(args.url, args.old, args.output or args.old)
+    print(f"Reused {reused} of {total} blocks, downloaded {fetched} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Downloads one file from File Server in segments over parallel keep alive
+# connections, resumes after an interruption and verifies the result against
+# the server checksum.
+#
+#   python downloader.py "http://host:7767/download?path=..." -c 8
+
+import os, re, json, hashlib, argparse, threading, http.client, urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK = 1024 * 1024
+
+
+class Downloader:
+    def __init__(
+        self,
+        url: str,
+        output: str = "",
+        connections: int = 8,
+        segment: int = 16 * 1024 * 1024,
+        strict=False,
+    ):
+        self.url = urllib.parse.urlsplit(url)
+        self.output = output
+        self.connections = connections
+        self.segment = segment
+        # fail instead of keeping a download the server could not checksum
+        self.strict = strict
+
+        self.size = 0
+        self.etag = ""
+        self.verified = None
+        self.done = set()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if not connection:
+            Connection = (
+                http.client.HTTPSConnection
+                if self.url.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            connection = self._local.connection = Connection(
+                self.url.netloc, timeout=60
+            )
+        return connection
+
+    def request(self, method: str, route: str = "", headers={}, params=""):
+        url = f"{route or self.url.path}?{self.url.query}{params}"
+        try:
+            self.connection.request(method, url, headers=headers)
+            return self.connection.getresponse()
+        except (http.client.BadStatusLine, ConnectionError):
+            # the server closed the idle keep alive connection, the request
+            # is sent once more on a new one
+            self.reconnect()
+            self.connection.request(method, url, headers=headers)
+            return self.connection.getresponse()
+
+    def reconnect(self):
+        self.connection.close()
+        self._local.connection = None
+
+    def probe(self):
+        # a one byte range tells the size and whether ranges are supported
+        response = self.request("GET", headers={"Range": "bytes=0-0"})
+        response.read()
+        if response.status == 200:
+            raise OSError("the server does not accept range requests")
+        if response.status != 206:
+            raise OSError(f"{self.url.path} : {response.status}")
+
+        self.size = int(response.getheader("Content-Range").rsplit("/", 1)[1])
+        self.etag = response.getheader("ETag", "")
+        if not self.output:
+            self.output = self.filename(response)
+
+    def filename(self, response) -> str:
+        disposition = response.getheader("Content-Disposition", "")
+        match = re.search(r"filename\*=UTF-8''([^;]+)", disposition)
+        if match:
+            return urllib.parse.unquote(match.group(1))
+        match = re.search(r'filename="?([^";]+)"?', disposition)
+        if match:
+            return match.group(1)
+        return os.path.basename(self.url.path) or "download"
+
+    @property
+    def part(self) -> str:
+        return f"{self.output}.part"
+
+    @property
+    def state(self) -> str:
+        return f"{self.output}.part.json"
+
+    def load(self):
+        # resumes only when the file on the server is still the same
+        try:
+            with open(self.state) as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return
+        if (state["size"], state["etag"], state["segment"]) == (
+            self.size,
+            self.etag,
+            self.segment,
+        ) and os.path.isfile(self.part):
+            self.done = set(state["done"])
+
+    def save(self):
+        state = dict(
+            url=self.url.geturl(),
+            size=self.size,
+            etag=self.etag,
+            segment=self.segment,
+            done=sorted(self.done),
+        )
+        with open(f"{self.state}.tmp", "w") as file:
+            json.dump(state, file)
+        os.replace(f"{self.state}.tmp", self.state)
+
+    def preallocate(self):
+        if not self.done or not os.path.isfile(self.part):
+            self.done = set()
+            with open(self.part, "wb") as file:
+                file.truncate(self.size)
+
+    def fetch(self, index: int) -> int:
+        start = index * self.segment
+        end = min(start + self.segment, self.size) - 1
+        headers = {"Range": f"bytes={start}-{end}"}
+        if self.etag and not self.etag.startswith("W/"):
+            # a changed file is sent whole with 200 instead of the range
+            headers["If-Range"] = self.etag
+
+        response = self.request("GET", headers=headers)
+        if response.status != 206:
+            # the whole file may follow, the connection is dropped instead
+            self.reconnect()
+            etag = response.getheader("ETag", "")
+            raise OSError(
+                f"segment {index} : {response.status}, "
+                f"the file changed? ETag {self.etag} is now {etag}"
+            )
+
+        size = 0
+        with open(self.part, "r+b") as file:
+            file.seek(start)
+            for chunk in iter(lambda: response.read(CHUNK), b""):
+                file.write(chunk)
+                size += len(chunk)
+        if size != end - start + 1:
+            raise OSError(f"segment {index} : got {size} of {end - start + 1} bytes")
+
+        with self._lock:
+            self.done.add(index)
+            self.save()
+        return size
+
+    def verify(self) -> bool:
+        # None when the server has no checksum of the file (yet)
+        response = self.request("GET", "/checksum", params="&wait=30")
+        body = response.read()
+        if response.status != 200:
+            # served without a path, or still hashing on the server
+            print(f"Not verified, /checksum : {response.status}")
+            return None
+        digests = json.loads(body)
+
+        sha256 = hashlib.sha256()
+        with open(self.part, "rb") as file:
+            for chunk in iter(lambda: file.read(CHUNK), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest() == digests["sha256"]
+
+    def run(self):
+        self.probe()
+        self.load()
+        self.preallocate()
+
+        segments = [
+            index
+            for index in range((self.size + self.segment - 1) // self.segment)
+            if index not in self.done
+        ]
+        with ThreadPoolExecutor(self.connections) as pool:
+            for _ in pool.map(self.fetch, segments):
+                pass
+
+        self.verified = self.verify()
+        if self.verified is None and self.strict:
+            # the .part file is kept, running again only verifies it
+            raise OSError("no checksum on the server yet, run again to verify")
+        if self.verified is False:
+            os.remove(self.state)
+            raise OSError("checksum mismatch, run again to download from scratch")
+
+        os.replace(self.part, self.output)
+        os.remove(self.state)
+        return self.output
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Download a file from File Server over parallel connections."
+    )
+    parser.add_argument("url", help="a /file or /download url")
+    parser.add_argument("-o", "--output", default="", help="defaults to the file name")
+    parser.add_argument("-c", "--connections", type=int, default=8)
+    parser.add_argument(
+        "-s", "--segment", type=int, default=16, help="segment size in MB"
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="fail when the server cannot checksum the file yet",
+    )
+    args = parser.parse_args(args)
+
+    downloader = Downloader(
+        args.url,
+        args.output,
+        args.connections,
+        args.segment * 1024 * 1024,
+        args.strict,
+    )
+    output = downloader.run()
+    print(f"Downloaded {output}{'' if downloader.verified else ', not verified'}")
+
+
+if __name__ == "__main__":
+    main()
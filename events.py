@@ -0,0 +1,135 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import collections, itertools, time
+
+Event = collections.namedtuple("Event", "kind id name bytes error time")
+
+
+class EventBus:
+    # deque.append and deque.popleft are atomic, so server threads publish
+    # without locks and the GUI drains on its own timer; when the GUI falls
+    # behind the oldest events are dropped instead of blocking a transfer
+    def __init__(self, maxlen: int = 10000):
+        self._events = collections.deque(maxlen=maxlen)
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def publish(self, kind: str, id: int = 0, name="", bytes=0, error=""):
+        self._events.append(Event(kind, id, name, bytes, error, time.time()))
+
+    def drain(self, limit: int = 1000) -> list:
+        events = []
+        for _ in range(limit):
+            try:
+                events.append(self._events.popleft())
+            except IndexError:
+                break
+        return events
+
+    def track(self, response, name: str, head=False):
+        # HEAD requests and bodiless statuses send nothing to count
+        if head or response.status_code < 200 or response.status_code in (204, 304):
+            return response
+        response.response = Tracked(
+            self, response.response, name, response.content_length
+        )
+        return response
+
+
+class Tracked:
+    # counts the bytes of a response body, publishing them at most every
+    # `interval` seconds
+    interval = 0.25
+
+    def __init__(self, bus: EventBus, iterable, name: str, expected: int = None):
+        self.bus = bus
+        self.iterable = iterable
+        self.name = name
+        self.expected = expected
+        self.id = bus.next_id()
+        self.sent = self.reported = 0
+        self.last = time.time()
+        self.failed = False
+        bus.publish("started", self.id, name)
+
+    def __iter__(self):
+        try:
+            for chunk in self.iterable:
+                self.sent += len(chunk)
+                now = time.time()
+                if now - self.last >= self.interval:
+                    self.report()
+                    self.last = now
+                yield chunk
+        except Exception as e:
+            self.failed = True
+            self.bus.publish("error", self.id, self.name, error=str(e))
+            raise
+
+    def report(self):
+        if self.sent > self.reported:
+            self.bus.publish("bytes", self.id, self.name, self.sent - self.reported)
+            self.reported = self.sent
+
+    def close(self):
+        self.report()
+        if self.failed:
+            pass
+        elif self.expected and self.sent < self.expected:
+            # the client went away before the whole body was sent
+            self.bus.publish("error", self.id, self.name, error="incomplete")
+        else:
+            self.bus.publish("finished", self.id, self.name, self.sent)
+        if hasattr(self.iterable, "close"):
+            self.iterable.close()
+
+
+class Stats:
+    # GUI side aggregation of drained events
+    def __init__(self, window: float = 1):
+        self.window = window
+        self.active = {}
+        self.errors = 0
+        self._bytes = collections.deque()
+
+    def update(self, events: list):
+        for event in events:
+            if event.kind == "started":
+                self.active[event.id] = event.name
+            elif event.kind == "bytes":
+                self._bytes.append((event.time, event.bytes))
+            elif event.kind == "finished":
+                self.active.pop(event.id, None)
+            elif event.kind == "error":
+                self.active.pop(event.id, None)
+                self.errors += 1
+
+        now = time.time()
+        while self._bytes and now - self._bytes[0][0] > self.window:
+            self._bytes.popleft()
+
+    @property
+    def throughput(self) -> float:
+        return sum(size for _, size in self._bytes) / self.window
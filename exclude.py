@@ -0,0 +1,167 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, re, threading
+
+DEFAULTS = ["__pycache__/", ".git/", "node_modules/", ".venv/", "venv/"]
+IGNORE_FILES = (".gitignore", ".fsignore")
+
+
+def translate(pattern: str) -> str:
+    # gitignore glob to regex, * and ? do not cross folders but ** does
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if c == "*":
+            regex += "[^/]*"
+        elif c == "?":
+            regex += "[^/]"
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                regex += "\\["
+            else:
+                group = pattern[i + 1 : j].replace("\\", "\\\\")
+                if group.startswith("!"):
+                    group = "^" + group[1:]
+                regex += f"[{group}]"
+                i = j
+        elif c == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(c)
+        i += 1
+    return regex
+
+
+class Rule:
+    def __init__(self, pattern: str, base: str):
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # a pattern with a slash is relative to the folder of its ignore file,
+        # otherwise it matches names at any depth below it
+        self.anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+
+        self.base = os.path.join(base, "")
+        self.regex = re.compile(translate(pattern), re.DOTALL)
+
+    def matches(self, path: str, name: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if not path.startswith(self.base):
+            return False
+        if self.anchored:
+            rel = path[len(self.base) :].replace(os.path.sep, "/")
+            return bool(self.regex.fullmatch(rel))
+        return bool(self.regex.fullmatch(name))
+
+
+class Exclusions:
+    # glob patterns plus the .gitignore and .fsignore files found on the way
+    # down, shared by listing, archiving, scanning and the manifest; walks
+    # prune excluded folders before opening them
+    def __init__(
+        self,
+        patterns: list = None,
+        ignore_files: tuple = IGNORE_FILES,
+        venvs: bool = True,
+    ):
+        self.patterns = DEFAULTS if patterns is None else patterns
+        self.ignore_files = ignore_files
+        self.venvs = venvs
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: str) -> list:
+        # parsed ignore files are cached until they change
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return []
+
+        cached = self._files.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        base = os.path.dirname(os.path.abspath(path))
+        try:
+            with open(path, encoding="utf-8", errors="replace") as file:
+                lines = file.read().splitlines()
+        except OSError:
+            return []
+        rules = [
+            Rule(line.strip(), base)
+            for line in lines
+            if line.strip() and not line.startswith("#")
+        ]
+        with self._lock:
+            self._files[path] = (mtime, rules)
+        return rules
+
+    def rules(self, folder: str, parent: list) -> list:
+        rules = list(parent)
+        for name in self.ignore_files:
+            rules += self.load(os.path.join(folder, name))
+        return rules
+
+    def root_rules(self, root: str) -> list:
+        root = os.path.abspath(root)
+        if os.path.isfile(root):
+            return [Rule(pattern, os.path.dirname(root)) for pattern in self.patterns]
+        return self.rules(root, [Rule(pattern, root) for pattern in self.patterns])
+
+    def rules_for(self, root: str, folder: str) -> list:
+        # the rules that apply inside folder, from root down to it
+        root, folder = os.path.abspath(root), os.path.abspath(folder)
+        rules = self.root_rules(root)
+        if folder == root or os.path.commonpath([root, folder]) != root:
+            return rules
+
+        path = root
+        for name in os.path.relpath(folder, root).split(os.path.sep):
+            path = os.path.join(path, name)
+            rules = self.rules(path, rules)
+        return rules
+
+    def excluded(self, rules: list, path: str, is_dir: bool) -> bool:
+        name = os.path.basename(path)
+        excluded = False
+        for rule in rules:
+            if rule.negate == excluded and rule.matches(path, name, is_dir):
+                excluded = not rule.negate
+        if not excluded and is_dir and self.venvs:
+            excluded = os.path.isfile(os.path.join(path, "pyvenv.cfg"))
+        return excluded
@@ -0,0 +1,87 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, time, threading, collections, urllib.parse
+
+
+def relative(root: str, path: str) -> str:
+    # the posix path of `path` under `root`, "" for the root itself
+    rel = os.path.relpath(path, root)
+    return "" if rel == "." else rel.replace(os.path.sep, "/")
+
+
+def contains(root: str, path: str) -> bool:
+    # whether the path is the root or below it, without touching the disk
+    root, path = os.path.abspath(root), os.path.abspath(path)
+    try:
+        return os.path.commonpath([root, path]) == root
+    except ValueError:
+        # paths on different drives
+        return False
+
+
+def quote(handle: str) -> str:
+    return urllib.parse.quote(handle, safe="/:@")
+
+
+class Handles:
+    # maps the short handles of urls back to paths: a handle is the path
+    # relative to a root, so it never names anything outside of it. The
+    # resolved real paths are cached for `ttl` seconds, a symlink leaving the
+    # root is refused like a ".." is
+    def __init__(self, entries: int = 4096, ttl: float = 5):
+        self.entries = entries
+        self.ttl = ttl
+        self._resolved = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, root: str, rel: str) -> str:
+        key = root, rel
+        now = time.monotonic()
+        with self._lock:
+            cached = self._resolved.get(key)
+            if cached and now - cached[1] < self.ttl:
+                self._resolved.move_to_end(key)
+                return cached[0]
+
+        path = self.contain(root, rel)
+        with self._lock:
+            self._resolved[key] = path, now
+            self._resolved.move_to_end(key)
+            while len(self._resolved) > self.entries:
+                self._resolved.popitem(last=False)
+        return path
+
+    def contain(self, root: str, rel: str) -> str:
+        # "" unless root/rel really is inside root
+        if os.path.isabs(rel) or "\0" in rel:
+            return ""
+        path = os.path.normpath(os.path.join(root, rel)) if rel else root
+        real_root = os.path.realpath(root)
+        real = os.path.realpath(path)
+        try:
+            if os.path.commonpath([real_root, real]) != real_root:
+                return ""
+        except ValueError:
+            # another drive
+            return ""
+        return path
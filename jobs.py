@@ -0,0 +1,153 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import threading, time, uuid
+import archive
+from limits import Limits
+from exclude import Exclusions
+
+
+class Job:
+    def __init__(
+        self,
+        folder: str,
+        cache: archive.ArchiveCache,
+        latest=True,
+        exclusions: Exclusions = None,
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.folder = folder
+        self.cache = cache
+        self.latest = latest
+        self.exclusions = exclusions
+        self.state = "queued"
+        self.path = ""
+        self.error = ""
+
+        self.files_total = self.bytes_total = 0
+        self.files_done = self.bytes_done = 0
+        self.started = self.finished = 0.0
+
+    def progress(self, files: int, size: int):
+        self.files_done = files
+        self.bytes_done = size
+
+    @property
+    def running(self) -> bool:
+        return self.state in ("queued", "scanning", "zipping")
+
+    @property
+    def eta(self):
+        if self.state != "zipping" or not self.bytes_done:
+            return None
+        elapsed = time.time() - self.started
+        left = self.bytes_total - self.bytes_done
+        return round(elapsed / self.bytes_done * max(left, 0), 1)
+
+    def status(self) -> dict:
+        return dict(
+            id=self.id,
+            state=self.state,
+            files_done=self.files_done,
+            files_total=self.files_total,
+            bytes_done=self.bytes_done,
+            bytes_total=self.bytes_total,
+            eta=self.eta,
+            error=self.error,
+        )
+
+    def run(self, limits: Limits):
+        limits.archives.acquire(blocking=True)
+        try:
+            self.state = "scanning"
+            self.started = time.time()
+            self.files_total, self.bytes_total = archive.scan(
+                self.folder, self.exclusions
+            )
+
+            self.state = "zipping"
+            self.started = time.time()
+            self.path = archive.zip(
+                self.folder, self.cache, self.latest, self.progress, self.exclusions
+            )
+            self.progress(self.files_total, self.bytes_total)
+            self.state = "done"
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+        finally:
+            self.finished = time.time()
+            limits.archives.release()
+
+
+class Jobs:
+    # at most `pending` jobs wait or run, finished jobs are kept for `keep` seconds
+    def __init__(
+        self,
+        limits: Limits,
+        cache: archive.ArchiveCache,
+        exclusions: Exclusions = None,
+        pending: int = 16,
+        keep: int = 3600,
+    ):
+        self.limits = limits
+        self.cache = cache
+        self.exclusions = exclusions
+        self.pending = pending
+        self.keep = keep
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def start(self, folder: str, latest=True, limits: Limits = None) -> Job:
+        # mounts pass their own limits, the server ones are used otherwise
+        limits = limits or self.limits
+        with self._lock:
+            self.expire()
+            for job in self._jobs.values():
+                if job.running and job.folder == folder:
+                    return job
+
+            if len(self.running) >= self.pending:
+                raise limits.busy(limits.archives)
+
+            job = Job(folder, self.cache, latest, self.exclusions)
+            self._jobs[job.id] = job
+
+        threading.Thread(target=job.run, args=(limits,), daemon=True).start()
+        return job
+
+    def get(self, id: str) -> Job:
+        return self._jobs.get(id)
+
+    def expire(self):
+        now = time.time()
+        for id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished > self.keep:
+                del self._jobs[id]
+
+    @property
+    def running(self) -> list[Job]:
+        return [job for job in list(self._jobs.values()) if job.running]
+
+    @property
+    def all(self) -> list[Job]:
+        return list(self._jobs.values())
@@ -0,0 +1,116 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import copy, threading
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.wsgi import ClosingIterator
+
+
+class Busy(ServiceUnavailable):
+    description = "The server is busy, try again later."
+
+
+class Limiter:
+    # limit <= 0 means unlimited, wait is how long a request queues for a slot
+    def __init__(self, name: str, limit: int = 0, wait: float = 0):
+        self.name = name
+        self.limit = limit
+        self.wait = wait
+        self.active = 0
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(limit) if limit > 0 else None
+
+    def acquire(self, blocking=False, wait: float = None) -> bool:
+        timeout = None if blocking else self.wait if wait is None else wait
+        if self._slots and not self._slots.acquire(timeout=timeout):
+            return False
+        with self._lock:
+            self.active += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        if self._slots:
+            self._slots.release()
+
+
+class Limits:
+    def __init__(
+        self,
+        archives: int = 2,
+        transfers: int = 8,
+        connections: int = 64,
+        wait: float = 5,
+        retry_after: int = 10,
+        large: int = 16 * 1024 * 1024,
+    ):
+        self.archives = Limiter("archives", archives, wait)
+        self.transfers = Limiter("transfers", transfers, wait)
+        self.connections = Limiter("connections", connections, wait)
+        self.retry_after = retry_after
+        # files at least this big take a transfer slot
+        self.large = large
+
+    def derive(self, archives: int = 0, transfers: int = 0) -> "Limits":
+        # own zip and transfer limits where they are given, these limiters and
+        # settings for everything else
+        limits = copy.copy(self)
+        if archives:
+            limits.archives = Limiter("archives", archives, self.archives.wait)
+        if transfers:
+            limits.transfers = Limiter("transfers", transfers, self.transfers.wait)
+        return limits
+
+    def busy(self, limiter: Limiter):
+        return Busy(
+            f"Too many concurrent {limiter.name}, try again later.",
+            retry_after=self.retry_after,
+        )
+
+    def archive(self):
+        if not self.archives.acquire():
+            raise self.busy(self.archives)
+        return Slot(self.archives)
+
+    def transfer(self, response, size: int):
+        # the slot is held until the response body has been sent
+        if size < self.large:
+            return response
+        if not self.transfers.acquire():
+            raise self.busy(self.transfers)
+        # send_file responses are passed through without calling the
+        # response close callbacks, so the body itself releases the slot
+        response.response = ClosingIterator(response.response, self.transfers.release)
+        return response
+
+
+class Slot:
+    def __init__(self, limiter: Limiter):
+        self.limiter = limiter
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.limiter.release()
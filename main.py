@@ -21,130 +21,212 @@
 # SOFTWARE.
 
 
-from flask import Flask, request, render_template, send_file
-import os, datetime, base64, random
+import argparse, os
 
-DIR = os.getcwd()
-BYTE = 1024
-UNITS = [
-    "B",
-    "KB",
-    "MB",
-    "GB",
-    "TB",
-]
 
-
-def get_size(file: str) -> str:
-    size = os.path.getsize(file)
-    order = 0
-    while size >= BYTE and order < len(UNITS):
-        order += 1
-        size /= BYTE
-    return f"{size:.1f} {UNITS[order]}"
-
-
-def get_dfs(folder: str) -> str:
-    dirs = []
-    files = []
-
-    for df in os.listdir(folder):
-        p = os.path.join(folder, df)
-
-        ls = [
-            f"?path={encode(os.path.abspath(p))}&rand={random.randint(0, 2000)}",
-            df,
-            get_size(p),
-            datetime.datetime.fromtimestamp(os.path.getmtime(p)).strftime(
-                "%d/%m/%Y %I:%M:%S %p"
-            ),
-        ]
-        master = None
-        if os.path.isdir(p):
-            master = dirs
-        elif os.path.isfile(p):
-            master = files
-
-        if master != None:
-            master.append(ls)
-
-    dirs.sort()
-    files.sort()
-    return dirs, files
-
-
-def encode(path: str):
-    return base64.b64encode(path.encode()).decode()
-
-
-def decode(path: str):
-    return base64.b64decode(path.encode()).decode()
-
-
-def get_request_path():
-    path = request.args.get("path")
-    return escape(decode(path)), path
-
-
-def base(path):
-    return os.path.basename(path)
-
-
-def escape(path: str):
-    return path.replace(os.path.sep, "/")
-
-
-app = Flask("FileServer")
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Serve a file or folder over HTTP.",
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        help="file or folder to serve, defaults to the current folder without mounts",
+    )
+    parser.add_argument(
+        "-m",
+        "--mount",
+        action="append",
+        default=[],
+        metavar="NAME=PATH",
+        help="also serve a folder at /m/NAME/, can be given more than once",
+    )
+    parser.add_argument(
+        "--mount-limits",
+        action="append",
+        default=[],
+        metavar="NAME=ARCHIVES,TRANSFERS",
+        help="concurrent zips and large transfers of one mount",
+    )
+    parser.add_argument(
+        "-b",
+        "--bind",
+        action="append",
+        help="address to bind, can be given more than once, "
+        "defaults to all IPv4 and IPv6 interfaces",
+    )
+    parser.add_argument("-p", "--port", type=int, default=7767)
+    parser.add_argument(
+        "-w", "--workers", type=int, default=16, help="request worker threads"
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="zip the served folder on every download instead of reusing the last zip",
+    )
+    parser.add_argument(
+        "--stream-zips",
+        action="store_true",
+        help="send folders as stored zips with a known size, made while they are sent",
+    )
+    parser.add_argument("--cache-dir", help="folder for thumbnails and other caches")
+    parser.add_argument(
+        "--archive-cache", type=int, default=4096, help="zip cache size in MB"
+    )
+    parser.add_argument(
+        "--archive-policy",
+        choices=["lru", "lfu"],
+        default="lru",
+        help="which zips leave a full cache first",
+    )
+    parser.add_argument(
+        "--compressed-cache",
+        type=int,
+        default=256,
+        help="cache size of compressed text files in MB",
+    )
+    parser.add_argument(
+        "--no-compression",
+        action="store_true",
+        help="send text files and pages without Content-Encoding",
+    )
+    parser.add_argument(
+        "--thumbnail-cache", type=int, default=64, help="thumbnail cache size in MB"
+    )
+    parser.add_argument(
+        "--hot-cache", type=int, default=64, help="memory for hot small files in MB"
+    )
+    parser.add_argument(
+        "--hot-object",
+        type=int,
+        default=1024,
+        help="largest file kept in memory in KB, bigger hot files are mapped",
+    )
+    parser.add_argument(
+        "-x",
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="gitignore style pattern to leave out of listings, zips and the manifest",
+    )
+    parser.add_argument(
+        "--no-default-excludes",
+        action="store_true",
+        help="do not exclude __pycache__, .git, node_modules and virtualenvs",
+    )
+    parser.add_argument(
+        "--no-ignore-files",
+        action="store_true",
+        help="do not read .gitignore and .fsignore files",
+    )
+    parser.add_argument(
+        "--access-log", metavar="PATH", help="write a json line per request to PATH"
+    )
+    parser.add_argument(
+        "--access-log-size",
+        type=int,
+        default=64,
+        help="size in MB at which the access log is rotated",
+    )
+    parser.add_argument(
+        "--access-log-backups", type=int, default=5, help="rotated access logs kept"
+    )
+    parser.add_argument("--archives", type=int, default=2, help="concurrent zips")
+    parser.add_argument(
+        "--transfers", type=int, default=8, help="concurrent large transfers"
+    )
+    parser.add_argument(
+        "--connections", type=int, default=64, help="concurrent connections"
+    )
+    parser.add_argument(
+        "--gui", choices=["qt", "tk"], help="start the Qt or tkinter window instead"
+    )
+    parser.add_argument(
+        "--debug", action="store_true", help="run the Flask development server"
+    )
+    return parser.parse_args(args)
 
 
-@app.route("/")
-def home():
-    return folder(DIR)
+def main(args=None):
+    args = parse_args(args)
 
+    # the GUI toolkits and Flask are only imported once they are needed
+    if args.gui == "qt":
+        import qt_main
 
-@app.route("/folder")
-def folder(folder=""):
-    if not folder:
-        folder, _ = get_request_path()
+        return qt_main.main()
+    elif args.gui == "tk":
+        import tk_main
 
-    dirs, files = get_dfs(folder)
-    is_root = folder == DIR
+        return tk_main.main()
 
-    parent = ""
-    if is_root:
-        index = base(folder)
-    else:
-        dirname = os.path.dirname(DIR).replace(os.path.sep, "/")
-        index = folder.replace(os.path.sep, "/").replace(dirname, "")
-        parent = (
-            f"?path={encode(os.path.dirname(folder))}&rand={random.randint(0, 2000)}"
-        )
+    from server import Server, CACHE
+    from limits import Limits
+    from exclude import Exclusions, DEFAULTS, IGNORE_FILES
+    import mounts
 
-    return render_template(
-        "file_server.html",
-        dirs=dirs,
-        files=files,
-        is_root=is_root,
-        parent=parent,
-        index=index,
+    exclusions = Exclusions(
+        ([] if args.no_default_excludes else DEFAULTS) + args.exclude,
+        () if args.no_ignore_files else IGNORE_FILES,
+        venvs=not args.no_default_excludes,
     )
 
-
-@app.route("/file")
-def file():
-    file, _ = get_request_path()
-    if escape(DIR) not in file:
-        return "Path not found!"
-    return send_file(file)
-
-
-@app.route("/download")
-def download():
-    path, _ = get_request_path()
-    if os.path.isdir(path):
-        path = ...
-        return "downlaod zip"
-    return send_file(path, as_attachment=True, attachment_filename=base(path))
-
-
-app.run(port=7767, debug=1)
+    megabyte = 1024 * 1024
+    server = Server(
+        Limits(args.archives, args.transfers, args.connections),
+        args.cache_dir or CACHE,
+        exclusions,
+        dict(
+            archives=args.archive_cache * megabyte,
+            thumbnails=args.thumbnail_cache * megabyte,
+            hot=args.hot_cache * megabyte,
+            compressed=args.compressed_cache * megabyte,
+        ),
+        args.archive_policy,
+    )
+    path = args.path or ("" if args.mount else os.getcwd())
+    server._path = os.path.abspath(path) if path else ""
+
+    limits = {}
+    for spec in args.mount_limits:
+        name, archives, transfers = mounts.parse_limits(spec)
+        limits[name] = archives, transfers
+    for spec in args.mount:
+        name, path = mounts.parse(spec)
+        try:
+            server.mounts.add(name, path, *limits.get(name, (0, 0)))
+        except ValueError as e:
+            raise SystemExit(e)
+    server.rebuild = args.rebuild
+    server.stream_zips = args.stream_zips
+    server.compression = not args.no_compression
+    if args.access_log:
+        server.log_access(
+            args.access_log, args.access_log_size * 1024 * 1024, args.access_log_backups
+        )
+    server.cache.max_object = args.hot_object * 1024
+
+    if args.debug:
+        host = args.bind[0] if args.bind else "0.0.0.0"
+        server.flask_app.run(host, args.port, debug=True)
+        return
+
+    listener = server.listen(args.bind, args.port, args.workers)
+    for host, port in listener.addresses:
+        host = f"[{host}]" if ":" in host else host
+        if server._path:
+            print(f"Serving {server._path} on http://{host}:{port}")
+        for mount in server.mounts.all:
+            print(f"Serving {mount.path} on http://{host}:{port}/m/{mount.name}/")
+    try:
+        listener.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server.access_log:
+            server.access_log.close()
+
+
+if __name__ == "__main__":
+    main()
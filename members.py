@@ -0,0 +1,207 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, io, struct, zipfile, tarfile, mimetypes, threading, datetime, collections
+
+ZIPS = (".zip", ".jar", ".whl")
+TARS = (".tar",)
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+
+class Member:
+    def __init__(self, name: str, size: int, mtime: float, is_dir=False):
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.is_dir = is_dir
+        # where the stored bytes start and how they are compressed
+        self.offset = 0
+        self.compressed = size
+        self.info = None
+
+    @property
+    def mimetype(self) -> str:
+        return mimetypes.guess_type(self.name)[0] or "application/octet-stream"
+
+
+class Slice(io.RawIOBase):
+    # a seekable window over part of a file, so a member is read in place
+    def __init__(self, path: str, offset: int, size: int):
+        self.file = open(path, "rb")
+        self.offset = offset
+        self.size = size
+        self.pos = 0
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self.size - self.pos)
+        if size <= 0:
+            return 0
+        self.file.seek(self.offset + self.pos)
+        read = self.file.readinto(memoryview(buffer)[:size])
+        self.pos += read
+        return read
+
+    def seek(self, pos: int, whence: int = 0) -> int:
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += self.size
+        self.pos = max(pos, 0)
+        return self.pos
+
+    def tell(self) -> int:
+        return self.pos
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+class Index:
+    # the members of one archive, read once from its central directory or
+    # tar headers, with the folders implied by the member names
+    def __init__(self, path: str, st: os.stat_result):
+        self.path = path
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.members: dict[str, Member] = {}
+        self.children: dict[str, list[str]] = collections.defaultdict(list)
+
+        if path.lower().endswith(ZIPS):
+            self.read_zip()
+        else:
+            self.read_tar()
+
+    def add(self, member: Member):
+        parts = member.name.split("/")
+        if not member.name or ".." in parts or "" in parts:
+            return
+
+        # folders only named by their members
+        for depth in range(1, len(parts)):
+            name = "/".join(parts[:depth])
+            folder = self.members.get(name)
+            if not folder:
+                folder = self.members[name] = Member(name, 0, member.mtime, True)
+                self.children["/".join(parts[: depth - 1])].append(name)
+            folder.size += member.size
+
+        old = self.members.get(member.name)
+        if old:
+            if old.is_dir:
+                # the folder entry came after some of its members
+                old.mtime = member.mtime
+            return
+        self.members[member.name] = member
+        self.children["/".join(parts[:-1])].append(member.name)
+
+    def read_zip(self):
+        with zipfile.ZipFile(self.path) as zip:
+            for info in zip.infolist():
+                if info.flag_bits & 0x1:
+                    # encrypted
+                    continue
+                try:
+                    mtime = datetime.datetime(*info.date_time).timestamp()
+                except ValueError:
+                    # an invalid date in the entry, shown as the zip epoch
+                    mtime = datetime.datetime(1980, 1, 1).timestamp()
+                member = Member(
+                    info.filename.strip("/"), info.file_size, mtime, info.is_dir()
+                )
+                member.compressed = info.compress_size
+                member.info = info
+                self.add(member)
+
+    def read_tar(self):
+        with tarfile.open(self.path, "r:") as tar:
+            for info in tar:
+                if not (info.isfile() or info.isdir()):
+                    continue
+                member = Member(
+                    info.name.strip("/"), info.size, info.mtime, info.isdir()
+                )
+                member.offset = info.offset_data
+                self.add(member)
+
+    def list(self, folder: str) -> list[Member]:
+        return [self.members[name] for name in self.children.get(folder, [])]
+
+    def open(self, member: Member):
+        if member.info is None:
+            return Slice(self.path, member.offset, member.size)
+
+        info = member.info
+        with open(self.path, "rb") as file:
+            file.seek(info.header_offset)
+            header = LOCAL_HEADER.unpack(file.read(LOCAL_HEADER.size))
+        if header[0] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(f"Bad local header of {member.name}")
+        offset = info.header_offset + LOCAL_HEADER.size + header[10] + header[11]
+
+        data = Slice(self.path, offset, info.compress_size)
+        if info.compress_type == zipfile.ZIP_STORED:
+            return data
+        # compressed members are decompressed while they are read
+        return zipfile.ZipExtFile(data, "rb", info, close_fileobj=True)
+
+
+class Indexes:
+    # the indexes of the last used `entries` archives, rebuilt when the
+    # archive size or mtime changes
+    def __init__(self, entries: int = 64):
+        self.entries = entries
+        self._indexes = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_archive(self, path: str) -> bool:
+        return path.lower().endswith(ZIPS + TARS)
+
+    def split(self, path: str) -> tuple:
+        # (archive, member name) for a path going through an archive
+        parts = path.replace(os.path.sep, "/").split("/")
+        for depth in range(len(parts), 0, -1):
+            archive = "/".join(parts[:depth])
+            if self.is_archive(archive) and os.path.isfile(archive):
+                return archive, "/".join(parts[depth:]).strip("/")
+        return None
+
+    def get(self, path: str) -> Index:
+        st = os.stat(path)
+        with self._lock:
+            index = self._indexes.get(path)
+            if index and (index.size, index.mtime_ns) == (st.st_size, st.st_mtime_ns):
+                self._indexes.move_to_end(path)
+                return index
+
+        index = Index(path, st)
+        with self._lock:
+            self._indexes[path] = index
+            while len(self._indexes) > self.entries:
+                self._indexes.popitem(last=False)
+        return index
@@ -0,0 +1,153 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Mirrors a folder served by File Server, downloading only new or changed
+# files over parallel connections.
+#
+#   python mirror.py http://host:7767 local_folder -j 8
+
+import os, json, argparse, threading, http.client, urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK = 1024 * 1024
+
+
+class Mirror:
+    def __init__(self, url: str, folder: str, jobs: int = 8):
+        self.url = urllib.parse.urlsplit(url)
+        self.folder = os.path.abspath(folder)
+        self.jobs = jobs
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> http.client.HTTPConnection:
+        # one keep alive connection per worker thread
+        connection = getattr(self._local, "connection", None)
+        if not connection:
+            Connection = (
+                http.client.HTTPSConnection
+                if self.url.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            connection = self._local.connection = Connection(
+                self.url.netloc, timeout=60
+            )
+        return connection
+
+    def get(self, url: str) -> http.client.HTTPResponse:
+        try:
+            self.connection.request("GET", url)
+            return self.connection.getresponse()
+        except (http.client.BadStatusLine, ConnectionError):
+            # the server closed the idle keep alive connection, the request
+            # is sent once more on a new one
+            self.connection.close()
+            self._local.connection = None
+            self.connection.request("GET", url)
+            return self.connection.getresponse()
+
+    def manifest(self):
+        query = urllib.parse.parse_qs(self.url.query)
+        params = {"path": query["path"][0]} if "path" in query else {}
+        url = "/manifest?" + urllib.parse.urlencode(params)
+        response = self.get(url)
+        if response.status != 200:
+            raise OSError(f"/manifest : {response.status} {response.read()[:200]!r}")
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+
+    def target(self, path: str) -> str:
+        target = os.path.abspath(os.path.join(self.folder, path))
+        if os.path.commonpath([self.folder, target]) != self.folder:
+            raise ValueError(f"{path} is outside of {self.folder}")
+        return target
+
+    def changed(self, entry: dict) -> bool:
+        try:
+            st = os.stat(self.target(entry["path"]))
+        except OSError:
+            return True
+        return st.st_size != entry["size"] or int(st.st_mtime) != int(entry["mtime"])
+
+    def fetch(self, entry: dict) -> int:
+        target = self.target(entry["path"])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        response = self.get(entry["url"])
+        if response.status != 200:
+            response.read()
+            raise OSError(f"{entry['path']} : {response.status}")
+
+        size = 0
+        temp = f"{target}.part"
+        with open(temp, "wb") as file:
+            for chunk in iter(lambda: response.read(CHUNK), b""):
+                file.write(chunk)
+                size += len(chunk)
+        if size != entry["size"]:
+            os.remove(temp)
+            raise OSError(f"{entry['path']} : got {size} of {entry['size']} bytes")
+
+        os.replace(temp, target)
+        os.utime(target, (entry["mtime"], entry["mtime"]))
+        return size
+
+    def run(self) -> tuple:
+        total = files = size = 0
+        failed = []
+        with ThreadPoolExecutor(self.jobs) as pool:
+            futures = {}
+            for entry in self.manifest():
+                total += 1
+                if self.changed(entry):
+                    futures[pool.submit(self.fetch, entry)] = entry
+
+            for future, entry in futures.items():
+                try:
+                    size += future.result()
+                    files += 1
+                    print(f"{entry['path']}")
+                except Exception as e:
+                    failed.append(entry["path"])
+                    print(f"{entry['path']} failed : {e}")
+        return total, files, size, failed
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Mirror a folder served by File Server."
+    )
+    parser.add_argument(
+        "url", help="the server url, or a /folder url to mirror a sub folder"
+    )
+    parser.add_argument("folder", help="local folder to mirror into")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="connections")
+    args = parser.parse_args(args)
+
+    total, files, size, failed = Mirror(args.url, args.folder, args.jobs).run()
+    print(f"{files} of {total} files downloaded, {size} bytes, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
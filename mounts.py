@@ -0,0 +1,103 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, re, threading
+from limits import Limits
+from handles import contains
+
+NAME = re.compile(r"^[\w.-]+$")
+
+
+class Mount:
+    # a named folder served at /m/<name>/, with its own zip and transfer
+    # limits when they are given; the others are shared with the server
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        archives: int = 0,
+        transfers: int = 0,
+        limits: Limits = None,
+    ):
+        self.name = name
+        self.path = os.path.abspath(path)
+        self.limits = None
+        if archives or transfers:
+            self.limits = (limits or Limits()).derive(archives, transfers)
+
+    def contains(self, path: str) -> bool:
+        return contains(self.path, path)
+
+
+class Mounts:
+    def __init__(self, limits: Limits = None):
+        # the server limits, mounts fall back to them
+        self.limits = limits
+        self._mounts: dict[str, Mount] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, path: str, archives: int = 0, transfers: int = 0):
+        if not NAME.match(name):
+            raise ValueError(f"Invalid mount name {name!r}")
+        if not os.path.exists(path):
+            raise ValueError(f"{path} does not exist")
+
+        mount = Mount(name, path, archives, transfers, self.limits)
+        with self._lock:
+            self._mounts[name] = mount
+        return mount
+
+    def remove(self, name: str):
+        with self._lock:
+            self._mounts.pop(name, None)
+
+    def get(self, name: str) -> Mount:
+        return self._mounts.get(name)
+
+    def find(self, path: str) -> Mount:
+        # the deepest mount holding the path
+        found = None
+        for mount in self.all:
+            if mount.contains(path) and (
+                not found or len(mount.path) > len(found.path)
+            ):
+                found = mount
+        return found
+
+    @property
+    def all(self) -> list[Mount]:
+        return sorted(self._mounts.values(), key=lambda mount: mount.name)
+
+
+def parse(spec: str) -> tuple:
+    # NAME=PATH from the command line, the name defaults to the folder name
+    name, sep, path = spec.partition("=")
+    if not sep:
+        name, path = os.path.basename(os.path.abspath(spec)), spec
+    return name, path
+
+
+def parse_limits(spec: str) -> tuple:
+    # NAME=ARCHIVES,TRANSFERS from the command line
+    name, _, limits = spec.partition("=")
+    archives, _, transfers = limits.partition(",")
+    return name, int(archives or 0), int(transfers or 0)
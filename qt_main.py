@@ -24,11 +24,10 @@
 from PySide6.QtGui import *
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
-import PySide6.QtNetwork, socket, resources, os, zipfile, datetime, random, base64
-from werkzeug.serving import make_server, BaseWSGIServer
-from flask import Flask, send_file, request, render_template
-
-TITLE = "File Server"
+import os
+from server import Server, Listener, TITLE
+from utils import AddressMonitor
+from events import Stats
 
 
 class QSwitch(QAbstractButton):
@@ -210,125 +209,60 @@ class QToggle(QSwitch):
     ...
 
 
-class Thread(QThread):
-    def __init__(self, run) -> None:
-        super().__init__()
-        self._run = run
-
-    def run(self):
-        self._run()
-
-
 class Label(QLabel):
     ...
 
 
-class Server:
-    def get_size(self, file: str) -> str:
-        size = os.path.getsize(file)
-        order = 0
-        while size >= self.BYTE and order < len(self.UNITS):
-            order += 1
-            size /= self.BYTE
-        return f"{size:.1f} {self.UNITS[order]}"
-
-    def get_dfs(self, folder: str) -> str:
-        dirs = []
-        files = []
-
-        for df in os.listdir(folder):
-            p = os.path.join(folder, df)
-
-            ls = [
-                f"?path={self.encode(os.path.abspath(p))}&rand={random.randint(0, 2000)}",
-                df,
-                self.get_size(p),
-                datetime.datetime.fromtimestamp(os.path.getmtime(p)).strftime(
-                    "%d/%m/%Y %I:%M:%S %p"
-                ),
-            ]
-            master = None
-            if os.path.isdir(p):
-                master = dirs
-            elif os.path.isfile(p):
-                master = files
-
-            if master != None:
-                master.append(ls)
-
-        dirs.sort()
-        files.sort()
-        return dirs, files
-
-    def encode(self, path: str):
-        return base64.b64encode(path.encode()).decode()
-
-    def decode(self, path: str):
-        return base64.b64decode(path.encode()).decode()
-
-    def get_request_path(self):
-        path = request.args.get("path")
-        return self.escape(self.decode(path)), path
-
-    def base(self, path):
-        return os.path.basename(path)
-
-    def __init__(self):
-        self.BYTE = 1024
-        self.UNITS = [
-            "B",
-            "KB",
-            "MB",
-            "GB",
-            "TB",
-        ]
-        self._path: str = ""
-
-        self.flask_app = Flask(TITLE)
-        self.flask_app.add_url_rule("/", view_func=self.home)
-        self.flask_app.add_url_rule("/folder", view_func=self.folder)
-        self.flask_app.add_url_rule("/file", view_func=self.file)
-
-    def home(self):
-        return self.folder(self._path)
-
-    def folder(self, folder=""):
-        dirname = self.escape(os.path.dirname(self._path))
-
-        if not folder:
-            folder, _ = self.get_request_path()
-            if self.escape(self._path) not in folder:
-                return "Path not found!"
-
-        dirs, files = self.get_dfs(folder)
-        is_root = folder == self._path
-
-        parent = ""
-        current = f"?path={self.encode(folder)}&rand={random.randint(0, 2000)}"
-        if is_root:
-            index = self.base(folder)
-        else:
-            index = self.escape(folder).replace(dirname, "")
-            parent = f"?path={self.encode(os.path.dirname(folder))}&rand={random.randint(0, 2000)}"
-
-        return render_template(
-            "file_server.html",
-            dirs=dirs,
-            files=files,
-            is_root=is_root,
-            parent=parent,
-            current=current,
-            index=index,
+class MountsDialog(QDialog):
+    def __init__(self, window: "Window"):
+        super().__init__(window)
+        self.window = window
+        self.setWindowTitle("Mounts")
+
+        lay = QHBoxLayout(self)
+        self.list = QListWidget()
+        lay.addWidget(self.list)
+
+        buttons = QVBoxLayout()
+        lay.addLayout(buttons)
+        add = QPushButton("Add")
+        add.clicked.connect(self.add)
+        buttons.addWidget(add)
+        remove = QPushButton("Remove")
+        remove.clicked.connect(self.remove)
+        buttons.addWidget(remove)
+        buttons.addStretch()
+        self.refresh()
+
+    def refresh(self):
+        self.list.clear()
+        for mount in self.window.mounts.all:
+            self.list.addItem(f"/m/{mount.name}/ : {mount.path}")
+        self.window.mounts_btn.setText(f"Mounts ({len(self.window.mounts.all)})")
+
+    def add(self):
+        path = QFileDialog.getExistingDirectory(self, "Select a folder to mount?")
+        if not path:
+            return
+        name, ok = QInputDialog.getText(
+            self,
+            "Mount name",
+            "Serve the folder at /m/<name>/",
+            text=os.path.basename(path),
         )
+        if not ok or not name:
+            return
+        try:
+            self.window.mounts.add(name, path)
+        except ValueError as e:
+            QMessageBox.critical(self, "Invalid mount", str(e))
+        self.refresh()
 
-    def file(self):
-        file, _ = self.get_request_path()
-        if self.escape(self._path) not in file:
-            return "Path not found!"
-        return send_file(file)
-
-    def escape(self, path: str):
-        return path.replace(os.path.sep, "/")
+    def remove(self):
+        row = self.list.currentRow()
+        if row >= 0:
+            self.window.mounts.remove(self.window.mounts.all[row].name)
+        self.refresh()
 
 
 class Window(Server, QWidget):
@@ -339,13 +273,11 @@ class Window(Server, QWidget):
         self.setWindowFlag(Qt.WindowStaysOnTopHint)
         self.setWindowTitle(TITLE)
 
-        self.flask_app.add_url_rule("/download", view_func=self.download)
-        self.flask_app.add_url_rule("/served", view_func=self.served)
-
         self._port: int = 7767
-        self.count = 0
 
-        self._server: BaseWSGIServer = None
+        self._server: Listener = None
+        self.addresses = AddressMonitor()
+        self.addresses.start()
 
         lay = QVBoxLayout(self)
 
@@ -376,9 +308,15 @@ class Window(Server, QWidget):
         l.addWidget(self.url)
         form.addRow(Label("Server PORT : "), l)
 
+        l = QHBoxLayout()
         self.isFolder = QSwitch()
         self.isFolder.toggled.connect(self.switch_icon)
-        form.addRow(Label("Path is Folder ? "), self.isFolder)
+        l.addWidget(self.isFolder)
+        l.addStretch()
+        self.mounts_btn = QPushButton("Mounts (0)")
+        self.mounts_btn.clicked.connect(lambda: MountsDialog(self).exec())
+        l.addWidget(self.mounts_btn)
+        form.addRow(Label("Path is Folder ? "), l)
 
         l = QHBoxLayout()
         self.path = Label()
@@ -391,11 +329,22 @@ class Window(Server, QWidget):
         l.addWidget(self.browse_btn)
         form.addRow(Label("Path to Serve : "), l)
 
+        l = QHBoxLayout()
         self.serve = QSwitch()
         self.serve.clicked.connect(self.server)
-        form.addRow(Label("Serve ? "), self.serve)
-
-        self._thread_ = None
+        l.addWidget(self.serve)
+        l.addStretch()
+        self.jobs_label = Label("0 Jobs")
+        self.jobs_label.setAlignment(Qt.AlignCenter)
+        self.jobs_label.setMinimumWidth(100)
+        l.addWidget(self.jobs_label)
+        form.addRow(Label("Serve ? "), l)
+
+        self.transfers = Label("0 Active")
+        self.transfers.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        form.addRow(Label("Transfers : "), self.transfers)
+        self.stats = Stats()
+        self.events_timer = self.startTimer(250)
 
         # self.t = QTimer()
         # self.t.singleShot(200, lambda: self.isFolder.setChecked(True))
@@ -406,59 +355,44 @@ class Window(Server, QWidget):
         timerId = event.timerId()
         if timerId == self.ip_timer:
             self.server_ip.setText(self.ip)
+            self.show_jobs()
+        elif timerId == self.events_timer:
+            self.show_transfers()
 
-    @property
-    def datetime(self) -> str:
-        return datetime.datetime.now().strftime("%A %d/%m/%Y %I/%M/%S %p")
-
-    def home(self):
-        if os.path.isfile(self._path):
-            path = os.path.basename(self._path)
-            return f"""
-                <p>Home Page @ {self.datetime}</p>
-                <p><a href=served?dum{random.randint(1, 2000)}>Download {path}</a></p>
-                <p><a href=served?latest={random.randint(1, 2000)}>Download Latest {path}</a></p>
-                """
-        return super().home()
-
-    def download(self):
-        path, _ = self.get_request_path()
-        if os.path.isdir(path):
-            path = self.zip(path, True)
-
-        self.count += 1
+    def show_transfers(self):
+        self.stats.update(self.events.drain())
         self.counter.setText(f"{self.count} Downloads")
-        return send_file(path, as_attachment=True, attachment_filename=self.base(path))
-
-    def served(self):
-        latest = request.args.get("latest", 0, bool)
-        path = self._path
-
-        if os.path.isdir(self._path):
-            path = self.zip(self._path, latest)
-
-        if path:
-            basename = os.path.basename(path)
-            self.count += 1
-            self.counter.setText(f"{self.count} Downloads")
-            return send_file(path, attachment_filename=basename, as_attachment=True)
-        return "No file is served"
+        self.transfers.setText(
+            f"{len(self.stats.active)} Active, "
+            f"{self.format_size(self.stats.throughput)}/s"
+        )
+        self.transfers.setToolTip("\n".join(self.stats.active.values()))
+
+    def show_jobs(self):
+        running = self.jobs.running
+        self.jobs_label.setText(f"{len(running)} Jobs")
+        self.jobs_label.setToolTip(
+            "\n".join(
+                f"{os.path.basename(job.folder)} : {job.state} "
+                f"{job.files_done}/{job.files_total} files"
+                for job in running
+            )
+        )
 
     def server(self):
         if self.serve.isChecked():
-            if self._path:
+            if self._path or self.mounts.all:
                 self._port = int(self.server_port.text() or self._port)
                 self.server_port.setText(str(self._port))
                 self.url.setText(f"http://{self.ip}:{self._port}")
                 self.server_port.setDisabled(True)
 
-                self._server = make_server(self.ip, self._port, self.flask_app)
+                self._server = self.listen(None, self._port)
 
                 self.ctx = self.flask_app.app_context()
                 self.ctx.push()
 
-                self._thread_ = Thread(self.serve_forever)
-                self._thread_.start()
+                self._server.start()
 
             else:
                 QMessageBox.critical(
@@ -468,13 +402,10 @@ class Window(Server, QWidget):
 
         else:
             if self._server:
-                self._server.shutdown_signal = True
+                self._server.shutdown()
                 self.server_port.setEnabled(True)
                 self._server = None
 
-    def serve_forever(self):
-        self._server.serve_forever()
-
     def switch_icon(self, toggled):
         self.browse_btn.setIcon(self.icons[toggled])
         self.browse_btn.setText(self.icon_texts[toggled])
@@ -493,55 +424,19 @@ class Window(Server, QWidget):
             if isinstance(path, tuple):
                 path = path[0]
 
-            self._path = path
+            self._path = os.path.abspath(path)
             self.path.setText(os.path.basename(path))
             self.path.setToolTip(path)
 
     @property
     def ip(self):
-        ip_, localhost = None, None
-        for ip in PySide6.QtNetwork.QNetworkInterface().allAddresses():
-            if ip.protocol() == ip.IPv4Protocol:
-                _ip = ip.toString()
-                if ip.isLoopback():
-                    localhost = _ip
-                else:
-                    ip_ = _ip
-        return ip_ or localhost
-
-    @property
-    def _ip(self):
-        return socket.gethostbyname(socket.gethostname())
-
-    def zip(self, folder: str, latest=False) -> str:
-        zipFileName = folder + ".zip"
-        if os.path.isfile(zipFileName) and not latest:
-            return zipFileName
-        print(f"Zipping {folder}")
-
-        # Create zip file
-        with zipfile.ZipFile(
-            zipFileName, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9
-        ) as zipFile:
-            if os.path.isdir(folder):
-                for root, dirs, files in os.walk(folder):
-                    if os.path.basename(root) == "__pycache__":
-                        continue
-
-                    for file in files:
-                        filename = os.path.join(root, file)
-                        arc = root.replace(folder, os.path.basename(folder))
-                        arcname = os.path.join(arc, file)
-                        zipFile.write(filename, arcname, zipfile.ZIP_DEFLATED)
-            else:
-                zipFile.write(folder, zipFileName, zipfile.ZIP_DEFLATED)
-        return zipFileName
+        return self.addresses.ip
 
 
 class App(QApplication):
     def close_win(self):
         if self.win._server:
-            self.win._server.shutdown_signal = True
+            self.win._server.shutdown()
         self.quit()
 
     def __init__(self):
@@ -606,5 +501,16 @@ class App(QApplication):
         )
 
 
-app = App()
-app.exec()
+def main():
+    try:
+        # compiled Qt resources are optional, icons are also read from static/
+        import resources
+    except ImportError:
+        pass
+
+    app = App()
+    return app.exec()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Replays an access log written with --access-log against a running server,
+# keeping the gaps between the requests divided by --speed, and reports the
+# latencies and bytes of the run.
+#
+#   python replay.py access.log --url http://localhost:7767 --speed 4
+
+import json, time, argparse, threading, http.client, urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK = 1024 * 1024
+
+
+def load(paths: list) -> list:
+    # rotated logs can be given in any order, records are sorted by time
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # a line cut by a crash
+                    continue
+                # connections refused before their request was read
+                if not record.get("refused"):
+                    records.append(record)
+    records.sort(key=lambda record: record["time"])
+    return records
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+class Replay:
+    def __init__(self, url: str, records: list, speed: float = 1, workers: int = 32):
+        self.url = urllib.parse.urlsplit(url)
+        self.records = records
+        self.speed = speed
+        self.workers = workers
+
+        self.results = []
+        self.errors = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if not connection:
+            Connection = (
+                http.client.HTTPSConnection
+                if self.url.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            connection = self._local.connection = Connection(
+                self.url.netloc, timeout=60
+            )
+        return connection
+
+    def send(self, record: dict, due: float):
+        headers = {"User-Agent": "FileServer replay"}
+        if record.get("range"):
+            headers["Range"] = record["range"]
+        if record.get("encoding"):
+            headers["Accept-Encoding"] = record["encoding"]
+        route = record["route"]
+        if record.get("query"):
+            route += f"?{record['query']}"
+
+        started = time.monotonic()
+        try:
+            self.connection.request(record["method"], route, headers=headers)
+            response = self.connection.getresponse()
+            size = 0
+            for chunk in iter(lambda: response.read(CHUNK), b""):
+                size += len(chunk)
+        except (OSError, http.client.HTTPException):
+            self._local.connection.close()
+            self._local.connection = None
+            with self._lock:
+                self.errors += 1
+            return
+
+        finished = time.monotonic()
+        with self._lock:
+            self.results.append(
+                (response.status, size, finished - started, started - due)
+            )
+
+    def run(self) -> dict:
+        if not self.records:
+            return self.summary(0)
+
+        first = self.records[0]["time"]
+        start = time.monotonic()
+        with ThreadPoolExecutor(self.workers, "Replay") as pool:
+            for record in self.records:
+                due = start
+                if self.speed > 0:
+                    due += (record["time"] - first) / self.speed
+                    wait = due - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                pool.submit(self.send, record, due)
+        return self.summary(time.monotonic() - start)
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = [result[2] for result in self.results]
+        size = sum(result[1] for result in self.results)
+        statuses = {}
+        for result in self.results:
+            statuses[result[0]] = statuses.get(result[0], 0) + 1
+        return dict(
+            requests=len(self.records),
+            errors=self.errors,
+            statuses=statuses,
+            bytes=size,
+            seconds=round(elapsed, 3),
+            throughput=round(size / elapsed if elapsed else 0),
+            p50=round(percentile(latencies, 0.5), 4),
+            p95=round(percentile(latencies, 0.95), 4),
+            p99=round(percentile(latencies, 0.99), 4),
+            # how far behind the schedule requests were sent, the client is
+            # too slow for the speed when this grows
+            late=round(max((result[3] for result in self.results), default=0), 4),
+        )
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Replay a File Server access log against a server."
+    )
+    parser.add_argument("logs", nargs="+", help="access log files")
+    parser.add_argument("-u", "--url", default="http://localhost:7767")
+    parser.add_argument(
+        "-s",
+        "--speed",
+        type=float,
+        default=1,
+        help="2 replays twice as fast as recorded, 0 as fast as possible",
+    )
+    parser.add_argument("-w", "--workers", type=int, default=32)
+    args = parser.parse_args(args)
+
+    replay = Replay(args.url, load(args.logs), args.speed, args.workers)
+    print(json.dumps(replay.run(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1037 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, datetime, random, base64, socket, socketserver, threading, urllib.parse
+import json, time, zlib, zipfile, tarfile, mimetypes, hashlib
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug.security import safe_join
+from werkzeug.wsgi import FileWrapper
+from flask import Flask, Response, send_file, request, render_template, jsonify
+from flask import url_for, abort, stream_with_context
+from limits import Limits
+from jobs import Jobs
+from events import EventBus
+from thumbs import Thumbnails
+from cache import FileCache, Entry, etag
+from checksum import Checksums
+from delta import Signatures
+from utils import walk
+from exclude import Exclusions
+from mounts import Mounts
+from members import Indexes, Index
+from compress import Sidecars, compressible, negotiate
+from accesslog import AccessLog, PATH
+from zipstream import ZipStream
+from handles import Handles, contains, relative, quote
+import archive, compress
+
+TITLE = "File Server"
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ICONS = ["folder", "file", "download", "fold-up"]
+CACHE = os.path.join(os.path.expanduser("~"), ".cache", "FileServer")
+
+
+class KeepAliveHandler(WSGIRequestHandler):
+    # HTTP/1.1 keeps the connection open between the requests of a page; a
+    # worker waiting on an idle connection is lost to the others, so only
+    # `server.idle` connections wait at a time, for `timeout` seconds at most.
+    # Whether a connection stays open is decided before the headers are sent
+    # and told with a Connection header, werkzeug's own one (always close
+    # from werkzeug 2.1 on) is replaced
+    protocol_version = "HTTP/1.1"
+    timeout = 5
+    waiting = False
+
+    def handle(self):
+        try:
+            super().handle()
+        finally:
+            self.wake()
+
+    def parse_request(self):
+        # the next request arrived
+        self.wake()
+        return super().parse_request()
+
+    def wake(self):
+        if self.waiting:
+            self.waiting = False
+            self.server.idle.release()
+
+    def send_response(self, code, message=None):
+        self.code = code
+        self.framed = False
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        key = keyword.lower()
+        if key == "connection":
+            # decided in end_headers
+            return
+        if key == "content-length" or (
+            key == "transfer-encoding" and value == "chunked"
+        ):
+            self.framed = True
+        super().send_header(keyword, value)
+
+    def end_headers(self):
+        if self.keep_alive():
+            self.waiting = self.server.idle.acquire(blocking=False)
+        if self.waiting:
+            super().send_header("Connection", "keep-alive")
+            super().send_header("Keep-Alive", f"timeout={self.timeout}")
+        else:
+            super().send_header("Connection", "close")
+        super().end_headers()
+
+    def keep_alive(self) -> bool:
+        # a GET or HEAD without a request body, whose response has a known end
+        if self.close_connection or self.command not in ("GET", "HEAD"):
+            return False
+        if self.headers.get("Content-Length") or self.headers.get("Transfer-Encoding"):
+            return False
+        bodiless = self.command == "HEAD" or self.code < 200 or self.code in (204, 304)
+        return self.framed or bodiless
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    # requests are handled by a pool of worker threads shared by all listeners
+    multithread = True
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        app,
+        pool: ThreadPoolExecutor,
+        idle: threading.Semaphore,
+        dualstack=False,
+        limits: Limits = None,
+        access_log: AccessLog = None,
+        **kwargs,
+    ):
+        self.pool = pool
+        self.idle = idle
+        self.dualstack = dualstack
+        self.limits = limits
+        self.access_log = access_log
+        kwargs.setdefault("handler", KeepAliveHandler)
+        super().__init__(host, port, app, **kwargs)
+
+    def server_bind(self):
+        if self.dualstack and self.address_family == socket.AF_INET6:
+            # accept IPv4 clients as IPv4-mapped addresses on the same socket
+            self.socket.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+        socketserver.TCPServer.server_bind(self)
+        # HTTPServer.server_bind resolves the fqdn of the address, which can
+        # block on slow DNS
+        self.server_name = self.server_address[0]
+        self.server_port = self.server_address[1]
+
+    def process_request(self, request, client_address):
+        # an accepted connection takes its slot before it queues for a worker,
+        # so the connection limit also bounds the queue of the pool
+        if self.limits and not self.limits.connections.acquire(wait=0):
+            self.refuse(request, client_address)
+            return
+        try:
+            self.pool.submit(self.process_request_thread, request, client_address)
+        except BaseException:
+            self.release()
+            self.shutdown_request(request)
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.release()
+
+    def release(self):
+        if self.limits:
+            self.limits.connections.release()
+
+    def refuse(self, request, client_address):
+        # a short 503 written by the accepting thread, no worker is taken. The
+        # request is never read, so the access log only gets the client
+        if self.access_log:
+            self.access_log.log(
+                dict(
+                    time=time.time(),
+                    client=client_address[0],
+                    status=503,
+                    bytes=0,
+                    refused=True,
+                )
+            )
+        busy = self.limits.busy(self.limits.connections)
+        body = busy.get_body().encode()
+        head = (
+            "HTTP/1.1 503 SERVICE UNAVAILABLE\r\n"
+            "Content-Type: text/html; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Retry-After: {self.limits.retry_after}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        try:
+            request.sendall(head.encode() + body)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+
+def default_bind() -> list:
+    return ["::"] if socket.has_ipv6 else ["0.0.0.0"]
+
+
+class Listener:
+    # one server per bound address, all feeding the same worker pool
+    def __init__(
+        self,
+        app,
+        addresses: list,
+        port: int,
+        workers: int = 16,
+        limits: Limits = None,
+        access_log: AccessLog = None,
+    ):
+        self.pool = ThreadPoolExecutor(workers, TITLE)
+        # half of the workers at most wait on idle keep-alive connections
+        self.idle = threading.BoundedSemaphore(workers // 2)
+        self.servers: list[PooledWSGIServer] = []
+
+        addresses = addresses or default_bind()
+        dualstack = "::" in addresses and "0.0.0.0" not in addresses
+        try:
+            for address in addresses:
+                try:
+                    server = PooledWSGIServer(
+                        address,
+                        port,
+                        app,
+                        self.pool,
+                        self.idle,
+                        dualstack and address == "::",
+                        limits,
+                        access_log,
+                    )
+                except OSError:
+                    if address != "::" or not dualstack:
+                        raise
+                    # IPv6 is disabled on this host
+                    server = PooledWSGIServer(
+                        "0.0.0.0",
+                        port,
+                        app,
+                        self.pool,
+                        self.idle,
+                        limits=limits,
+                        access_log=access_log,
+                    )
+                self.servers.append(server)
+        except BaseException:
+            self.close()
+            raise
+
+        self._threads = []
+
+    @property
+    def addresses(self) -> list:
+        return [server.server_address[:2] for server in self.servers]
+
+    def start(self):
+        for server in self.servers:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def serve_forever(self):
+        self.start()
+        try:
+            for thread in self._threads:
+                thread.join()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        for server in self.servers:
+            if self._threads:
+                server.shutdown()
+        self.close()
+
+    def close(self):
+        for server in self.servers:
+            server.server_close()
+        self.servers = []
+        self.pool.shutdown(wait=False)
+
+
+class Server:
+    def get_size(self, file: str) -> str:
+        return self.format_size(os.path.getsize(file))
+
+    def format_size(self, size: float) -> str:
+        order = 0
+        while size >= self.BYTE and order < len(self.UNITS):
+            order += 1
+            size /= self.BYTE
+        return f"{size:.1f} {self.UNITS[order]}"
+
+    def get_dfs(self, folder: str) -> str:
+        dirs = []
+        files = []
+
+        rules = self.exclusions.rules_for(self.root_of(folder), folder)
+        base = self.handle(folder).rstrip("/")
+        for df in os.listdir(folder):
+            p = os.path.join(folder, df)
+            if self.exclusions.excluded(rules, p, os.path.isdir(p)):
+                continue
+
+            ls = [
+                f"?path={quote(f'{base}/{df}')}",
+                df,
+                self.get_size(p),
+                self.format_date(os.path.getmtime(p)),
+                self.thumbnails.is_image(df),
+                self.members.is_archive(df),
+            ]
+            master = None
+            if os.path.isdir(p):
+                master = dirs
+            elif os.path.isfile(p):
+                master = files
+
+            if master != None:
+                master.append(ls)
+
+        dirs.sort()
+        files.sort()
+        return dirs, files
+
+    def member_dfs(self, index: Index, folder: str):
+        # the listing of a folder inside an archive
+        dirs = []
+        files = []
+        base = self.handle(index.path)
+        for member in index.list(folder):
+            ls = [
+                f"?path={quote(f'{base}/{member.name}')}",
+                member.name.rsplit("/", 1)[-1],
+                self.format_size(member.size),
+                self.format_date(member.mtime),
+                False,
+                False,
+            ]
+            (dirs if member.is_dir else files).append(ls)
+
+        dirs.sort()
+        files.sort()
+        return dirs, files
+
+    def format_date(self, timestamp: float) -> str:
+        return datetime.datetime.fromtimestamp(timestamp).strftime(
+            "%d/%m/%Y %I:%M:%S %p"
+        )
+
+    def handle(self, path: str) -> str:
+        # "/<relative path>" under the served path, "<mount>:/<relative path>"
+        # under a mount
+        root = self.root_of(path)
+        if not root:
+            return ""
+        prefix = "" if root == self._path else f"{self.mounts.find(path).name}:"
+        return f"{prefix}/{relative(root, path)}"
+
+    def resolve(self, handle: str) -> str:
+        # the path of a handle, "" for anything outside of the roots
+        if handle.startswith("/"):
+            root, rel = self._path, handle[1:]
+        else:
+            name, sep, rel = handle.partition(":/")
+            mount = self.mounts.get(name) if sep else None
+            root = mount.path if mount else ""
+        return self.handles.resolve(root, rel) if root else ""
+
+    def get_request_path(self):
+        handle = request.values.get("path", "")
+        file = self.resolve(handle)
+        request.environ[PATH] = file
+        return file, handle
+
+    def base(self, path):
+        return os.path.basename(path)
+
+    def root_of(self, path: str) -> str:
+        # the served path or the mount holding the path, empty when neither does
+        if not path:
+            return ""
+        if self._path and contains(self._path, path):
+            return self._path
+        mount = self.mounts.find(path)
+        return mount.path if mount else ""
+
+    def limits_for(self, path: str) -> Limits:
+        # mounts with their own limits, everything else shares the server ones.
+        # Mounts are matched first, a mount inside the served folder keeps its
+        # limits whichever url reaches it
+        mount = self.mounts.find(path)
+        if mount and mount.limits:
+            return mount.limits
+        return self.limits
+
+    def __init__(
+        self,
+        limits: Limits = None,
+        cache_dir: str = CACHE,
+        exclusions: Exclusions = None,
+        budgets: dict = None,
+        archive_policy: str = "lru",
+    ):
+        self.BYTE = 1024
+        self.UNITS = [
+            "B",
+            "KB",
+            "MB",
+            "GB",
+            "TB",
+        ]
+        self._path: str = ""
+        # rebuild the zip of the served folder on every download
+        self.rebuild = False
+        # send folders as stored zips made while they are sent
+        self.stream_zips = False
+        self.count = 0
+        self.limits = limits or Limits()
+        self.exclusions = exclusions or Exclusions()
+        self.mounts = Mounts(self.limits)
+        self.handles = Handles()
+        # cache sizes in bytes by cache, given here as the caches are cleaned
+        # up to their budget on start
+        budgets = budgets or {}
+        self.archives = archive.ArchiveCache(
+            os.path.join(cache_dir, "archives"),
+            budgets.get("archives", 4 * 1024 * 1024 * 1024),
+            archive_policy,
+        )
+        self.jobs = Jobs(self.limits, self.archives, self.exclusions)
+        self.events = EventBus()
+        self.cache_dir = cache_dir
+        self.thumbnails = Thumbnails(
+            os.path.join(cache_dir, "thumbnails"),
+            budget=budgets.get("thumbnails", 64 * 1024 * 1024),
+        )
+        self.cache = FileCache(budgets.get("hot", 64 * 1024 * 1024))
+        self.members = Indexes()
+        # text bodies smaller than this are sent as they are
+        self.compress_min = 1024
+        # files up to this size are hashed when sent and get their sha256 as
+        # etag, bigger ones always get the mtime and size one
+        self.strong_etag = 1024 * 1024
+        self.compression = True
+        self.sidecars = Sidecars(
+            os.path.join(cache_dir, "compressed"),
+            budgets.get("compressed", 256 * 1024 * 1024),
+        )
+        self.access_log: AccessLog = None
+        self._icons_css = None
+        self.checksums = Checksums(os.path.join(cache_dir, "checksums.json"))
+        self.signatures = Signatures(os.path.join(cache_dir, "signatures"))
+
+        self.flask_app = Flask(TITLE, root_path=ROOT)
+        self.flask_app.view_functions["static"] = self.static
+        self.flask_app.after_request(self.compress_response)
+        self.flask_app.add_url_rule("/", view_func=self.home)
+        self.flask_app.add_url_rule("/folder", view_func=self.folder)
+        self.flask_app.add_url_rule("/file", view_func=self.file)
+        self.flask_app.add_url_rule("/thumb", view_func=self.thumb)
+        self.flask_app.add_url_rule("/icons.css", view_func=self.icons)
+        self.flask_app.add_url_rule("/checksum", view_func=self.checksum)
+        self.flask_app.add_url_rule("/signature", view_func=self.signature)
+        self.flask_app.add_url_rule("/manifest", view_func=self.manifest)
+        self.flask_app.add_url_rule("/jobs", view_func=self.list_jobs)
+        self.flask_app.add_url_rule("/jobs", view_func=self.start_job, methods=["POST"])
+        self.flask_app.add_url_rule("/jobs/<id>", view_func=self.job)
+        self.flask_app.add_url_rule("/jobs/<id>/download", view_func=self.job_download)
+        self.flask_app.add_url_rule("/download", view_func=self.download)
+        self.flask_app.add_url_rule("/served", view_func=self.served)
+        self.flask_app.add_url_rule("/m/", view_func=self.list_mounts)
+        self.flask_app.add_url_rule("/m/<name>/", view_func=self.mount)
+        self.flask_app.add_url_rule("/m/<name>/<path:path>", view_func=self.mount)
+
+    @property
+    def datetime(self) -> str:
+        return datetime.datetime.now().strftime("%A %d/%m/%Y %I/%M/%S %p")
+
+    def home(self):
+        if not self._path:
+            return self.list_mounts()
+        if os.path.isfile(self._path):
+            path = os.path.basename(self._path)
+            return f"""
+                <p>Home Page @ {self.datetime}</p>
+                <p><a href=served?dum{random.randint(1, 2000)}>Download {path}</a></p>
+                <p><a href=served?latest={random.randint(1, 2000)}>Download Latest {path}</a></p>
+                """
+        return self.folder(self._path)
+
+    def folder(self, folder=""):
+        if not folder:
+            folder, _ = self.get_request_path()
+        root = self.root_of(folder)
+        if not root:
+            return "Path not found!"
+        dirname = self.escape(os.path.dirname(root))
+
+        # folders inside an archive have no zip download
+        archived = not os.path.isdir(folder)
+        zippable = True
+        if not archived:
+            dirs, files = self.get_dfs(folder)
+        else:
+            inside = self.inside(folder)
+            if not inside:
+                return "Path not found!", 404
+            index, name = inside
+            member = index.members.get(name)
+            if name and not (member and member.is_dir):
+                return "Path not found!", 404
+            dirs, files = self.member_dfs(index, name)
+            zippable = not name
+        is_root = folder == root
+
+        parent = ""
+        current = f"?path={quote(self.handle(folder))}"
+        if is_root:
+            index = self.base(folder)
+        else:
+            index = self.escape(folder).replace(dirname, "")
+            parent = f"?path={quote(self.handle(os.path.dirname(folder)))}"
+
+        # the urls are made once per page instead of once per row
+        response = Response(
+            render_template(
+                "file_server.html",
+                dirs=dirs,
+                files=files,
+                is_root=is_root,
+                parent=parent,
+                current=current,
+                zippable=zippable,
+                archived=archived,
+                index=index,
+                folder=url_for("folder"),
+                file_url=url_for("file"),
+                download=url_for("download"),
+                thumb=url_for("thumb"),
+                icons=url_for("icons", v=self.icons_css[1]),
+            )
+        )
+        # the page is checked again on every visit instead of the old random
+        # query strings
+        response.cache_control.no_cache = True
+        return response
+
+    def file(self):
+        file, _ = self.get_request_path()
+        if not self.root_of(file):
+            return "Path not found!"
+        return self.send(file)
+
+    def checksum(self):
+        file, _ = self.get_request_path()
+        if not self.root_of(file) or not os.path.isfile(file):
+            return "Path not found!", 404
+
+        wait = min(request.args.get("wait", 1, float), 30)
+        digests = self.checksums.get(file, wait)
+        if not digests:
+            response = jsonify(state="hashing")
+            response.status_code = 202
+            response.headers["Retry-After"] = "5"
+            return response
+        return jsonify(name=self.base(file), size=os.path.getsize(file), **digests)
+
+    def signature(self):
+        file, _ = self.get_request_path()
+        if not self.root_of(file) or not os.path.isfile(file):
+            return "Path not found!", 404
+
+        block = request.args.get("block", 0, int)
+        if block and not 4096 <= block <= 16 * 1024 * 1024:
+            return "Block size must be from 4 KB to 16 MB", 400
+
+        wait = min(request.args.get("wait", 1, float), 30)
+        signature = self.signatures.get(file, block, wait)
+        if not signature:
+            response = jsonify(state="hashing")
+            response.status_code = 202
+            response.headers["Retry-After"] = "5"
+            return response
+        return jsonify(signature)
+
+    def manifest(self):
+        folder = self._path
+        if request.args.get("path"):
+            folder, _ = self.get_request_path()
+            if not self.root_of(folder):
+                return "Path not found!", 404
+        if not folder:
+            return "No file is served", 404
+
+        hashes = request.args.get("hash", 0, bool)
+        return Response(
+            stream_with_context(self.manifest_lines(folder, hashes)),
+            mimetype="application/x-ndjson",
+        )
+
+    def manifest_lines(self, folder: str, hashes=False):
+        # one json line per file, streamed while walking the tree
+        if os.path.isfile(folder):
+            entries = [(os.path.abspath(folder), self.base(folder), os.stat(folder))]
+        else:
+            entries = (
+                (os.path.abspath(entry.path), rel, entry.stat())
+                for entry, rel in walk(
+                    folder,
+                    self.exclusions,
+                    self.exclusions.rules_for(self.root_of(folder), folder),
+                )
+            )
+
+        for path, rel, st in entries:
+            line = dict(
+                path=rel,
+                size=st.st_size,
+                mtime=st.st_mtime,
+                url=url_for("file", path=self.handle(path)),
+            )
+            if hashes:
+                digests = self.checksums.lookup(path)
+                if digests:
+                    line["sha256"] = digests["sha256"]
+            yield json.dumps(line) + "\n"
+
+    def thumb(self):
+        file, _ = self.get_request_path()
+        if (
+            not self.root_of(file)
+            or not self.thumbnails.is_image(file)
+            or not os.path.isfile(file)
+        ):
+            return "Path not found!", 404
+        thumbnail = self.thumbnails.get(file)
+        if not thumbnail:
+            # unreadable or still being made, the listing shows the file icon
+            # and asks again on the next visit while the thumbnail is made
+            response = send_file(
+                os.path.join(self.flask_app.static_folder, "file.png"), max_age=60
+            )
+            if not self.thumbnails.failed(file):
+                response.cache_control.max_age = None
+                response.cache_control.no_cache = True
+            return response
+        return send_file(thumbnail, mimetype="image/jpeg", max_age=7 * 24 * 3600)
+
+    def escape(self, path: str):
+        return path.replace(os.path.sep, "/")
+
+    def job_status(self, job) -> dict:
+        status = job.status()
+        status["url"] = url_for("job", id=job.id)
+        if job.state == "done":
+            status["download"] = url_for("job_download", id=job.id)
+        return status
+
+    def list_jobs(self):
+        return jsonify([self.job_status(job) for job in self.jobs.all])
+
+    def start_job(self):
+        folder = self._path
+        if request.values.get("path"):
+            folder, _ = self.get_request_path()
+            if not self.root_of(folder):
+                return "Path not found!", 404
+        if not folder:
+            return "No file is served", 404
+
+        latest = request.values.get("latest", 1, int)
+        job = self.jobs.start(folder, bool(latest), self.limits_for(folder))
+        return jsonify(self.job_status(job)), 202
+
+    def job(self, id: str):
+        job = self.jobs.get(id)
+        if not job:
+            return "Job not found!", 404
+        return jsonify(self.job_status(job))
+
+    def download(self):
+        path, _ = self.get_request_path()
+        if not self.root_of(path):
+            return "Path not found!", 404
+
+        limits = self.limits_for(path)
+        if os.path.isdir(path) and self.streamed():
+            self.downloaded()
+            return self.stream_zip(path, limits)
+        if os.path.isdir(path):
+            with limits.archive():
+                path = self.zip(path, True)
+
+        self.downloaded()
+        return self.send(path, as_attachment=True, limits=limits)
+
+    def served(self):
+        latest = request.args.get("latest", 0, bool)
+        path = self._path
+
+        if os.path.isdir(self._path) and self.streamed():
+            self.downloaded()
+            return self.stream_zip(self._path)
+        if os.path.isdir(self._path):
+            with self.limits.archive():
+                path = self.zip(self._path, latest or self.rebuild)
+
+        if path:
+            self.downloaded()
+            return self.send(path, as_attachment=True)
+        return "No file is served"
+
+    def job_download(self, id: str):
+        job = self.jobs.get(id)
+        if not job:
+            return "Job not found!", 404
+        if job.state != "done":
+            return f"Job is {job.state}", 409
+
+        self.downloaded()
+        return self.send(job.path, as_attachment=True)
+
+    def downloaded(self):
+        self.count += 1
+
+    def streamed(self) -> bool:
+        return request.args.get("stream", int(self.stream_zips), int) > 0
+
+    def stream_zip(self, folder: str, limits: Limits = None) -> Response:
+        # a stored zip with a known length made while it is sent; crcs from
+        # the checksum cache allow random ranges, files without one are hashed
+        # in the background for the next download, a batch at a time
+        base = self.base(folder)
+        rules = self.exclusions.rules_for(self.root_of(folder), folder)
+
+        def files():
+            # consumed by the stream as the tree is walked
+            prefetch = True
+            for entry, rel in walk(folder, self.exclusions, rules):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                digests = self.checksums.lookup(entry.path)
+                if not digests and prefetch:
+                    prefetch = self.checksums.prefetch(entry.path)
+                crc = int(digests["crc32"], 16) if digests else None
+                yield rel, st.st_size, st.st_mtime, crc
+
+        stream = ZipStream(folder, base, files())
+        response = Response(
+            FileWrapper(stream, 256 * 1024),
+            mimetype="application/zip",
+            direct_passthrough=True,
+        )
+        response.content_length = stream.length
+        response.headers["Content-Disposition"] = self.disposition(f"{base}.zip")
+        response.set_etag(stream.etag())
+        response.headers["Accept-Ranges"] = "bytes"
+        # without the crcs a range is reached by reading up to it
+        response = response.make_conditional(
+            request, accept_ranges=True, complete_length=stream.length
+        )
+        # a transfer turned away by the limits is never tracked
+        limits = limits or self.limits_for(folder)
+        response = limits.transfer(response, stream.length)
+        return self.events.track(response, f"{base}.zip", request.method == "HEAD")
+
+    def list_mounts(self):
+        links = "".join(
+            f'<p><a href="{url_for("mount", name=mount.name)}">{mount.name}</a></p>'
+            for mount in self.mounts.all
+        )
+        return f"<p>Mounts @ {self.datetime}</p>{links}"
+
+    def mount(self, name: str, path=""):
+        mount = self.mounts.get(name)
+        if not mount:
+            return "Mount not found!", 404
+
+        # like a handle, a symlink leaving the mount is refused
+        path = self.handles.resolve(mount.path, path)
+        request.environ[PATH] = path
+        if not path or not (os.path.exists(path) or self.inside(path)):
+            return "Path not found!", 404
+        if os.path.isdir(path) or self.members.is_archive(path):
+            return self.folder(path)
+        return self.send(path)
+
+    def inside(self, path: str) -> tuple:
+        # (index, member name) for a path going through a readable archive
+        split = self.members.split(path)
+        if not split:
+            return None
+        try:
+            return self.members.get(split[0]), split[1]
+        except (OSError, zipfile.BadZipFile, tarfile.TarError):
+            return None
+
+    def send(self, path: str, as_attachment=False, limits: Limits = None):
+        if not os.path.isfile(path):
+            inside = self.inside(path)
+            if inside:
+                return self.send_member(*inside, as_attachment, limits)
+            return "Path not found!", 404
+        name = self.base(path)
+
+        # the same etag for a cached, compressed or read copy of the file
+        st = os.stat(path)
+        tag = self.validator(path, st)
+        compressed = None if as_attachment else self.send_compressed(path, tag)
+        entry = None if compressed else self.cache.get(path)
+        if compressed:
+            response = compressed
+            size = st.st_size
+        elif entry:
+            response = self.send_entry(entry, as_attachment, etag=tag)
+            size = entry.size
+        else:
+            response = send_file(
+                path,
+                as_attachment=as_attachment,
+                attachment_filename=name,
+                etag=tag,
+            )
+            size = st.st_size
+        response = (limits or self.limits_for(path)).transfer(response, size)
+        return self.events.track(response, name, request.method == "HEAD")
+
+    def encoding(self, mimetype: str) -> str:
+        # the negotiated Content-Encoding of a text response, if any
+        if not self.compression or not compressible(mimetype):
+            return None
+        return negotiate(request.accept_encodings)
+
+    def validator(self, path: str, st: os.stat_result) -> str:
+        # one etag per version of a file: small files are hashed on the spot
+        # for their sha256, big ones keep the cheap tag even once they are
+        # hashed, so the etag never changes while the file does not
+        if st.st_size <= self.strong_etag:
+            try:
+                digests = self.checksums.now(path)
+            except OSError:
+                digests = None
+            if digests:
+                return digests["sha256"]
+        return etag(st)
+
+    def send_compressed(self, path: str, tag: str) -> Response:
+        # ranges are only served from the file itself
+        mimetype = mimetypes.guess_type(path)[0]
+        encoding = self.encoding(mimetype)
+        if not encoding or request.range:
+            return None
+        st = os.stat(path)
+        if st.st_size < self.compress_min:
+            return None
+
+        # the sidecar is compressed at the best level and the on the fly copy
+        # faster, so only the sidecar bytes get a strong etag
+        sidecar = self.sidecars.get(path, st, encoding)
+        if sidecar:
+            response = Response(
+                FileWrapper(open(sidecar, "rb")),
+                mimetype=mimetype,
+                direct_passthrough=True,
+            )
+            response.content_length = os.path.getsize(sidecar)
+        else:
+            response = Response(
+                compress.stream(FileWrapper(open(path, "rb")), encoding),
+                mimetype=mimetype,
+                direct_passthrough=True,
+            )
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.last_modified = st.st_mtime
+        response.set_etag(f"{tag}-{encoding}", weak=not sidecar)
+        return response.make_conditional(request)
+
+    def compress_response(self, response: Response) -> Response:
+        # compresses the listing, json and the manifest; files are compressed
+        # by send_compressed
+        if not compressible(response.mimetype):
+            return response
+        response.vary.add("Accept-Encoding")
+        if (
+            response.direct_passthrough
+            or response.status_code != 200
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        encoding = self.encoding(response.mimetype)
+        if not encoding:
+            return response
+
+        if response.is_streamed:
+            response.response = compress.stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < self.compress_min:
+                return response
+            response.set_data(compress.compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def send_member(
+        self, index: Index, name: str, as_attachment=False, limits: Limits = None
+    ):
+        # a member is read in place, decompressed while it is sent if needed
+        member = index.members.get(name)
+        if not member or member.is_dir:
+            return "Path not found!", 404
+
+        response = Response(
+            FileWrapper(index.open(member), 256 * 1024),
+            mimetype=member.mimetype,
+            direct_passthrough=True,
+        )
+        response.content_length = member.size
+        response.last_modified = member.mtime
+        response.set_etag(
+            f"{index.mtime_ns:x}-{index.size:x}-{zlib.crc32(name.encode()):x}"
+        )
+        if as_attachment:
+            response.headers["Content-Disposition"] = self.disposition(name)
+        response = response.make_conditional(
+            request, accept_ranges=True, complete_length=member.size
+        )
+        limits = limits or self.limits_for(index.path)
+        response = limits.transfer(response, member.size)
+        return self.events.track(response, self.base(name), request.method == "HEAD")
+
+    def send_entry(self, entry: Entry, as_attachment=False, max_age=None, etag=None):
+        # small files are sent in one chunk straight from memory
+        size = entry.size if not entry.mapped else 256 * 1024
+        response = Response(
+            FileWrapper(entry.open(), max(size, 1)),
+            mimetype=entry.mimetype,
+            direct_passthrough=True,
+        )
+        response.content_length = entry.size
+        response.last_modified = entry.mtime
+        response.set_etag(etag or entry.etag)
+        if as_attachment:
+            response.headers["Content-Disposition"] = self.disposition(entry.path)
+        if max_age:
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+        return response.make_conditional(
+            request, accept_ranges=True, complete_length=entry.size
+        )
+
+    def disposition(self, path: str) -> str:
+        name = self.base(path)
+        try:
+            name.encode("ascii")
+            return f'attachment; filename="{name}"'
+        except UnicodeEncodeError:
+            quoted = urllib.parse.quote(name)
+            return f"attachment; filename*=UTF-8''{quoted}"
+
+    @property
+    def icons_css(self) -> tuple:
+        # the listing icons as data uris in one stylesheet, with its version
+        if not self._icons_css:
+            rules = []
+            for name in ICONS:
+                with open(
+                    os.path.join(self.flask_app.static_folder, f"{name}.png"), "rb"
+                ) as file:
+                    data = base64.b64encode(file.read()).decode()
+                rules.append(
+                    f".i-{name}{{background-image:url(data:image/png;base64,{data})}}"
+                )
+            css = "\n".join(rules).encode()
+            self._icons_css = css, hashlib.sha1(css).hexdigest()[:12]
+        return self._icons_css
+
+    def icons(self):
+        css, version = self.icons_css
+        # compressed here so that the etag names the encoding
+        encoding = self.encoding("text/css")
+        if encoding:
+            response = Response(compress.compress(css, encoding), mimetype="text/css")
+            response.headers["Content-Encoding"] = encoding
+            response.set_etag(f"{version}-{encoding}")
+        else:
+            response = Response(css, mimetype="text/css")
+            response.set_etag(version)
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        if request.args.get("v") == version:
+            # the url changes with the icons
+            response.cache_control.max_age = 365 * 24 * 3600
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.max_age = 24 * 3600
+        return response.make_conditional(request)
+
+    def static(self, filename: str):
+        path = safe_join(self.flask_app.static_folder, filename)
+        if not path or not os.path.isfile(path):
+            abort(404)
+        entry = self.cache.get(path)
+        if entry:
+            return self.send_entry(entry, max_age=24 * 3600)
+        return send_file(path, max_age=24 * 3600)
+
+    def zip(self, folder: str, latest=False) -> str:
+        return archive.zip(folder, self.archives, latest, exclusions=self.exclusions)
+
+    def log_access(
+        self, path: str, max_bytes: int = 64 * 1024 * 1024, backups: int = 5
+    ) -> AccessLog:
+        # logs every request, including the ones turned away by the limits.
+        # Connections refused over --connections are logged by the
+        # listener, so call this before listen()
+        self.access_log = AccessLog(path, max_bytes, backups)
+        self.flask_app.wsgi_app = self.access_log.middleware(self.flask_app.wsgi_app)
+        return self.access_log
+
+    def listen(self, addresses: list, port: int, workers: int = 16) -> Listener:
+        return Listener(
+            self.flask_app, addresses, port, workers, self.limits, self.access_log
+        )
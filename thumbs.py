@@ -0,0 +1,120 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from utils import prune
+
+try:
+    from PIL import Image
+except ImportError:
+    # thumbnails are only made when Pillow is installed
+    Image = None
+
+EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+class Thumbnails:
+    def __init__(
+        self,
+        folder: str,
+        size: int = 128,
+        budget: int = 64 * 1024 * 1024,
+        workers: int = 2,
+    ):
+        self.folder = folder
+        self.size = size
+        self.budget = budget
+        self.pool = ThreadPoolExecutor(workers, "Thumbnails")
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.used = 0
+        if self.available:
+            os.makedirs(folder, exist_ok=True)
+            self.used = prune(folder, budget)
+
+    @property
+    def available(self) -> bool:
+        return Image is not None
+
+    def is_image(self, path: str) -> bool:
+        return self.available and os.path.splitext(path)[1].lower() in EXTENSIONS
+
+    def key(self, path: str, st: os.stat_result) -> str:
+        key = f"{path}\0{st.st_mtime_ns}\0{st.st_size}\0{self.size}"
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, path: str, timeout: float = 0.5) -> str:
+        # None when the image cannot be read, or is not ready after `timeout`;
+        # a request worker only waits a moment for the small thumbnail pool
+        key = os.path.join(self.folder, self.key(path, os.stat(path)))
+        target = f"{key}.jpg"
+        if os.path.isfile(target):
+            os.utime(target)
+            return target
+        if self.failed(path):
+            return None
+
+        with self._lock:
+            future = self._pending.get(target)
+            if not future:
+                future = self.pool.submit(self.make, path, target)
+                self._pending[target] = future
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            return None
+        finally:
+            with self._lock:
+                if future.done():
+                    self._pending.pop(target, None)
+
+    def failed(self, path: str) -> bool:
+        # whether this version of the file could not be read before
+        key = self.key(path, os.stat(path))
+        return os.path.isfile(os.path.join(self.folder, f"{key}.failed"))
+
+    def make(self, path: str, target: str) -> str:
+        temp = f"{target}.{threading.get_ident()}.tmp"
+        try:
+            with Image.open(path) as image:
+                # lets JPEG decode at a reduced scale
+                image.draft("RGB", (self.size, self.size))
+                image.thumbnail((self.size, self.size))
+                if image.mode != "RGB":
+                    image = image.convert("RGB")
+                image.save(temp, "JPEG", quality=80)
+        except Exception:
+            # broken or unsupported images are not decoded again until they
+            # change, an empty marker is kept instead of the thumbnail
+            if os.path.exists(temp):
+                os.remove(temp)
+            open(f"{os.path.splitext(target)[0]}.failed", "w").close()
+            return None
+        os.replace(temp, target)
+
+        with self._lock:
+            self.used += os.path.getsize(target)
+            if self.used > self.budget:
+                self.used = prune(self.folder, self.budget)
+        return target
@@ -21,17 +21,15 @@
 # SOFTWARE.
 
 from signal import Signals
-from threading import Thread
 from tkinter import *
-from tkinter import ttk, messagebox, filedialog
-import socket, os, zipfile, datetime, random, base64
-from werkzeug.serving import make_server, BaseWSGIServer
-from flask import Flask, send_file, request, render_template
-
+from tkinter import ttk, messagebox, filedialog, simpledialog
+import os
+from server import Server, Listener, TITLE
+from utils import AddressMonitor
+from events import Stats
 
 BG = "#27384b"
 FG = "white"
-TITLE = "File Server"
 
 
 class Check(Checkbutton):
@@ -91,112 +89,54 @@ class LabelE(Frame):
         self.entry.insert("0", text)
 
 
-class Server:
-    def get_size(self, file: str) -> str:
-        size = os.path.getsize(file)
-        order = 0
-        while size >= self.BYTE and order < len(self.UNITS):
-            order += 1
-            size /= self.BYTE
-        return f"{size:.1f} {self.UNITS[order]}"
-
-    def get_dfs(self, folder: str) -> str:
-        dirs = []
-        files = []
-
-        for df in os.listdir(folder):
-            p = os.path.join(folder, df)
-
-            ls = [
-                f"?path={self.encode(os.path.abspath(p))}&rand={random.randint(0, 2000)}",
-                df,
-                self.get_size(p),
-                datetime.datetime.fromtimestamp(os.path.getmtime(p)).strftime(
-                    "%d/%m/%Y %I:%M:%S %p"
-                ),
-            ]
-            master = None
-            if os.path.isdir(p):
-                master = dirs
-            elif os.path.isfile(p):
-                master = files
-
-            if master != None:
-                master.append(ls)
-
-        dirs.sort()
-        files.sort()
-        return dirs, files
-
-    def encode(self, path: str):
-        return base64.b64encode(path.encode()).decode()
-
-    def decode(self, path: str):
-        return base64.b64decode(path.encode()).decode()
-
-    def get_request_path(self):
-        path = request.args.get("path")
-        return self.escape(self.decode(path)), path
-
-    def base(self, path):
-        return os.path.basename(path)
-
-    def __init__(self):
-        self.BYTE = 1024
-        self.UNITS = [
-            "B",
-            "KB",
-            "MB",
-            "GB",
-            "TB",
-        ]
-        self._path: str = ""
-
-        self.flask_app = Flask(TITLE)
-        self.flask_app.add_url_rule("/", view_func=self.home)
-        self.flask_app.add_url_rule("/folder", view_func=self.folder)
-        self.flask_app.add_url_rule("/file", view_func=self.file)
-
-    def home(self):
-        return self.folder(self._path)
-
-    def folder(self, folder=""):
-        dirname = self.escape(os.path.dirname(self._path))
-
-        if not folder:
-            folder, _ = self.get_request_path()
-            if self.escape(self._path) not in folder:
-                return "Path not found!"
-
-        dirs, files = self.get_dfs(folder)
-        is_root = folder == self._path
-
-        parent = ""
-        current = f"?path={self.encode(folder)}&rand={random.randint(0, 2000)}"
-        if is_root:
-            index = self.base(folder)
-        else:
-            index = self.escape(folder).replace(dirname, "")
-            parent = f"?path={self.encode(os.path.dirname(folder))}&rand={random.randint(0, 2000)}"
-
-        return render_template(
-            "file_server.html",
-            dirs=dirs,
-            files=files,
-            is_root=is_root,
-            parent=parent,
-            current=current,
-            index=index,
+class MountsWindow(Toplevel):
+    def __init__(self, app: "App"):
+        super().__init__(app, bg=BG)
+        self.app = app
+        self.title("Mounts")
+        self.geometry("400x200")
+
+        self.list = Listbox(self, bg=BG, fg=FG)
+        self.list.place(relx=0.02, rely=0.04, relw=0.7, relh=0.92)
+
+        for index, (text, command) in enumerate(
+            [("Add", self.add), ("Remove", self.remove)]
+        ):
+            Button(
+                self, bg=BG, fg=FG, relief="groove", text=text, command=command
+            ).place(relx=0.75, rely=0.04 + index * 0.2, relw=0.23, relh=0.16)
+        self.refresh()
+
+    def refresh(self):
+        self.list.delete(0, "end")
+        for mount in self.app.mounts.all:
+            self.list.insert("end", f"/m/{mount.name}/ : {mount.path}")
+        self.app.mounts_btn.config(text=f"Mounts ({len(self.app.mounts.all)})")
+
+    def add(self):
+        path = filedialog.askdirectory(
+            parent=self, mustexist=True, title="Select a folder to mount?"
         )
+        if not path:
+            return
+        name = simpledialog.askstring(
+            "Mount name",
+            "Serve the folder at /m/<name>/",
+            initialvalue=os.path.basename(path),
+            parent=self,
+        )
+        if not name:
+            return
+        try:
+            self.app.mounts.add(name, path)
+        except ValueError as e:
+            messagebox.showwarning("Invalid mount", str(e), parent=self)
+        self.refresh()
 
-    def file(self):
-        file, _ = self.get_request_path()
-        if self.escape(self._path) not in file:
-            return "Path not found!"
-        return send_file(file)
-
-    def escape(self, path: str):
-        return path.replace(os.path.sep, "/")
+    def remove(self):
+        for index in self.list.curselection():
+            self.app.mounts.remove(self.app.mounts.all[index].name)
+        self.refresh()
 
 
 class App(Server, Tk):
@@ -210,23 +150,21 @@ class App(Server, Tk):
         Tk.__init__(self)
 
         width = 503
-        self.geometry(f"{width}x190")
+        self.geometry(f"{width}x228")
         self.title(TITLE)
 
         self.protocol("WM_DELETE_WINDOW", self.close_server)
         self.resizable(0, 0)
 
-        self.flask_app.add_url_rule("/download", view_func=self.download)
-        self.flask_app.add_url_rule("/served", view_func=self.served)
-
         self._port: int = 7767
-        self.count = 0
 
-        self._server: BaseWSGIServer = None
+        self._server: Listener = None
+        self.addresses = AddressMonitor()
+        self.addresses.start()
 
         self.w = 0
         self.y = 0.02
-        h = 0.18
+        h = 0.14
 
         def place(wid, width):
             wid.place(relx=0.02, rely=self.y, relh=h, w=width)
@@ -250,6 +188,15 @@ class App(Server, Tk):
 
         self.icon_texts = ["Browse File", "Browse Folder"]
         self.isFolder = Check(self, text="Path is Folder ? ", command=self.switch_icon)
+        self.mounts_btn = Button(
+            self,
+            bg=BG,
+            fg=FG,
+            relief="groove",
+            text="Mounts (0)",
+            command=lambda: MountsWindow(self),
+        )
+        place2(self.mounts_btn)
         place(self.isFolder, 150)
 
         self.browse_btn = Button(
@@ -266,51 +213,55 @@ class App(Server, Tk):
         self.path = LabelL(self, "Path to Serve : ", w)
         place(self.path, w)
 
+        self.jobs_label = Label_(self, text="0 Jobs")
+        place2(self.jobs_label, 180)
+
         self.serve = Check(self, text="Serve ? ", command=self.server)
         place(self.serve, 150)
 
+        w = width - 20
+        self.transfers = LabelL(self, "Transfers : ", w)
+        place(self.transfers, w)
+        self.stats = Stats()
+
         self.after(500, self.set_ip)
+        self.after(250, self.show_transfers)
 
         self.mainloop()
 
     @property
     def ip(self):
-        return socket.gethostbyname(socket.gethostname())
+        return self.addresses.ip
 
     def set_ip(self):
         self.server_ip.setText(self.ip)
+        self.show_jobs()
         self.after(500, self.set_ip)
 
-    def switch_icon(self):
-        toggled = self.isFolder.checked
-        self.browse_btn.config(text=self.icon_texts[toggled])
-
-    def download(self):
-        path, _ = self.get_request_path()
-        if os.path.isdir(path):
-            path = self.zip(path, True)
+    def show_jobs(self):
+        running = self.jobs.running
+        text = f"{len(running)} Jobs"
+        if running:
+            job = running[0]
+            text += f" ({job.state} {job.files_done}/{job.files_total})"
+        self.jobs_label.config(text=text)
 
-        self.count += 1
+    def show_transfers(self):
+        self.stats.update(self.events.drain())
         self.counter.config(text=f"{self.count} Downloads")
-        return send_file(path, as_attachment=True, attachment_filename=self.base(path))
-
-    def served(self):
-        latest = request.args.get("latest", 0, bool)
-        path = self._path
-
-        if os.path.isdir(self._path):
-            path = self.zip(self._path, latest)
+        self.transfers.setText(
+            f"{len(self.stats.active)} Active, "
+            f"{self.format_size(self.stats.throughput)}/s"
+        )
+        self.after(250, self.show_transfers)
 
-        if path:
-            basename = os.path.basename(path)
-            self.count += 1
-            self.counter.setText(f"{self.count} Downloads")
-            return send_file(path, attachment_filename=basename, as_attachment=True)
-        return "No file is served"
+    def switch_icon(self):
+        toggled = self.isFolder.checked
+        self.browse_btn.config(text=self.icon_texts[toggled])
 
     def server(self):
         if self.serve.checked:
-            if self._path:
+            if self._path or self.mounts.all:
                 self._port = int(self.server_port.text() or self._port)
                 self.server_port.setText(str(self._port))
 
@@ -319,13 +270,12 @@ class App(Server, Tk):
 
                 self.server_port.entry.config(state="disabled")
 
-                self._server = make_server(self.ip, self._port, self.flask_app)
+                self._server = self.listen(None, self._port)
 
                 self.ctx = self.flask_app.app_context()
                 self.ctx.push()
 
-                self._thread_ = Thread(target=self.serve_forever)
-                self._thread_.start()
+                self._server.start()
 
             else:
                 messagebox.showwarning(
@@ -335,13 +285,10 @@ class App(Server, Tk):
 
         else:
             if self._server:
-                self._server.shutdown_signal = True
+                self._server.shutdown()
                 self.server_port.entry.config(state="normal")
                 self._server = None
 
-    def serve_forever(self):
-        self._server.serve_forever()
-
     def browse(self):
         path = ""
         if self.isFolder.checked:
@@ -356,32 +303,13 @@ class App(Server, Tk):
             if isinstance(path, tuple):
                 path = path[0]
 
-            self._path = path
+            self._path = os.path.abspath(path)
             self.path.setText(os.path.basename(path))
 
-    def zip(self, folder: str, latest=False) -> str:
-        zipFileName = folder + ".zip"
-        if os.path.isfile(zipFileName) and not latest:
-            return zipFileName
-        print(f"Zipping {folder}")
-
-        # Create zip file
-        with zipfile.ZipFile(
-            zipFileName, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9
-        ) as zipFile:
-            if os.path.isdir(folder):
-                for root, dirs, files in os.walk(folder):
-                    if os.path.basename(root) == "__pycache__":
-                        continue
-
-                    for file in files:
-                        filename = os.path.join(root, file)
-                        arc = root.replace(folder, os.path.basename(folder))
-                        arcname = os.path.join(arc, file)
-                        zipFile.write(filename, arcname, zipfile.ZIP_DEFLATED)
-            else:
-                zipFile.write(folder, zipFileName, zipfile.ZIP_DEFLATED)
-        return zipFileName
+
+def main():
+    App()
 
 
-App()
+if __name__ == "__main__":
+    main()
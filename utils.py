@@ -20,7 +20,110 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import socket
+import os, socket, threading
 
-IP = lambda: socket.gethostbyname(socket.gethostname())
-print(IP())
+
+def local_ip(family=socket.AF_INET) -> str:
+    # connecting a UDP socket only asks the routing table for the outgoing
+    # interface, nothing is sent and no DNS lookup is made
+    target = "10.255.255.255" if family == socket.AF_INET else "fd00::1"
+    try:
+        with socket.socket(family, socket.SOCK_DGRAM) as s:
+            s.connect((target, 1))
+            return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1" if family == socket.AF_INET else "::1"
+
+
+IP = local_ip
+
+
+class AddressMonitor(threading.Thread):
+    # refreshes the local address in the background so the GUIs only read a
+    # cached value and never block on lookups
+    def __init__(self, interval: float = 5, on_change=None):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.on_change = on_change
+        self.ip = local_ip()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            ip = local_ip()
+            if ip != self.ip:
+                self.ip = ip
+                if self.on_change:
+                    self.on_change(ip)
+
+    def stop(self):
+        self._done.set()
+
+
+def walk(root: str, exclusions=None, rules: list = None):
+    # depth first with one open scandir iterator per level, so memory grows
+    # with the depth of the tree and not with the number of entries; yields
+    # the entries of files with their path relative to root, excluded folders
+    # are skipped without being opened; the rules match absolute paths, so the
+    # root is made absolute too
+    root = os.path.abspath(root)
+    if exclusions and rules is None:
+        rules = exclusions.root_rules(root)
+
+    stack = [(os.scandir(root), "", rules)]
+    try:
+        while stack:
+            entries, rel, rules = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                entries.close()
+                stack.pop()
+                continue
+
+            path = rel + entry.name
+            try:
+                # symlinked folders are not followed to avoid loops
+                if entry.is_dir(follow_symlinks=False):
+                    if exclusions:
+                        if exclusions.excluded(rules, entry.path, True):
+                            continue
+                        folder_rules = exclusions.rules(entry.path, rules)
+                    else:
+                        folder_rules = None
+                    stack.append((os.scandir(entry.path), path + "/", folder_rules))
+                elif entry.is_file():
+                    if exclusions and exclusions.excluded(rules, entry.path, False):
+                        continue
+                    yield entry, path
+            except OSError:
+                continue
+    finally:
+        for entries, _, _ in stack:
+            entries.close()
+
+
+def prune(folder: str, budget: int) -> int:
+    # removes the least recently used files of a cache folder until it fits
+    # the budget, cache hits touch the files so mtime is the last use
+    entries = []
+    used = 0
+    for entry in os.scandir(folder):
+        if entry.is_file(follow_symlinks=False):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            used += st.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if used <= budget:
+            break
+        try:
+            os.remove(path)
+            used -= size
+        except OSError:
+            pass
+    return used
+
+
+if __name__ == "__main__":
+    print(IP())
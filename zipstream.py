@@ -0,0 +1,310 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, io, zlib, bisect, struct, hashlib, time
+from array import array
+
+LOCAL = struct.Struct("<IHHHHHIIIHH")
+CENTRAL = struct.Struct("<IHHHHHHIIIHHHHHII")
+DESCRIPTOR = struct.Struct("<IIII")
+DESCRIPTOR64 = struct.Struct("<IIQQ")
+END = struct.Struct("<IHHHHIIH")
+END64 = struct.Struct("<IQHHIIQQQQ")
+LOCATOR64 = struct.Struct("<IIQI")
+EXTRA64 = struct.Struct("<HH")
+
+LIMIT = 0xFFFFFFFF
+# the utf-8 flag is set for every name
+UTF8 = 0x800
+DESCRIPTOR_FLAG = 0x8
+
+
+def dos_time(mtime: float) -> tuple:
+    t = time.localtime(max(mtime, 315532800))
+    date = (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+    return t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2, date
+
+
+def central_extra(size: int, compressed: int, offset: int) -> bytes:
+    # the zip64 fields of a central record, for the values too big for it
+    fields = [value for value in (size, compressed, offset) if value >= LIMIT]
+    if not fields:
+        return b""
+    return EXTRA64.pack(1, 8 * len(fields)) + struct.pack(f"<{len(fields)}Q", *fields)
+
+
+def central(
+    name: bytes,
+    times: tuple,
+    crc: int,
+    compressed: int,
+    size: int,
+    offset: int,
+    method: int = 0,
+    flags: int = UTF8,
+    mode: int = 0o100644,
+) -> bytes:
+    extra = central_extra(size, compressed, offset)
+    header = CENTRAL.pack(
+        0x02014B50,
+        45 | 3 << 8,
+        45 if extra else 20,
+        flags,
+        method,
+        *times,
+        crc,
+        min(compressed, LIMIT),
+        min(size, LIMIT),
+        len(name),
+        len(extra),
+        0,
+        0,
+        0,
+        mode << 16,
+        min(offset, LIMIT),
+    )
+    return header + name + extra
+
+
+def end(count: int, offset: int, size: int) -> bytes:
+    # the end of central directory, with the zip64 records when needed
+    records = b""
+    if count >= 0xFFFF or size >= LIMIT or offset >= LIMIT:
+        records = END64.pack(0x06064B50, 44, 45, 45, 0, 0, count, count, size, offset)
+        records += LOCATOR64.pack(0x07064B50, 0, offset + size, 1)
+    return records + END.pack(
+        0x06054B50,
+        0,
+        0,
+        min(count, 0xFFFF),
+        min(count, 0xFFFF),
+        min(size, LIMIT),
+        min(offset, LIMIT),
+        0,
+    )
+
+
+class ZipStream(io.RawIOBase):
+    # a zip of stored (not compressed) members that is generated while it is
+    # read, with its exact length known from the file sizes alone. The crcs
+    # are always written in data descriptors after each member and in the
+    # central directory, so the bytes only depend on the names, sizes and
+    # times of the files. When the crc32 of every member is known, e.g. from
+    # the checksum cache, any byte range can be read at random; otherwise the
+    # crcs are computed while the members are read in order. The relative
+    # paths are kept in one bytearray and everything else in arrays, so a
+    # file takes about 80 bytes plus its path once the arrays have grown
+    # (7.8 MB for 100,000 files)
+    def __init__(self, root: str, base: str, files):
+        # files yields (relative path, size, mtime, crc32 or None) tuples
+        self.root = root
+        self.base = f"{base}/".encode()
+        self.rels = bytearray()
+        self.starts = array("Q", [0])
+        self.sizes = array("Q")
+        self.times = array("H")
+        self.crcs = array("L")
+        self.known = True
+
+        # local header offsets, then the offsets of the central records
+        self.offsets = array("Q")
+        pos = 0
+        for rel, size, mtime, crc in files:
+            index = len(self.sizes)
+            self.rels += rel.encode()
+            self.starts.append(len(self.rels))
+            self.sizes.append(size)
+            self.times.extend(dos_time(mtime))
+            self.crcs.append(crc or 0)
+            self.known = self.known and crc is not None
+            self.offsets.append(pos)
+            pos += self.local_size(index) + size + self.descriptor_size(index)
+        self.count = len(self.sizes)
+        self.central_offset = pos
+
+        self.central_offsets = array("Q")
+        for index in range(self.count):
+            self.central_offsets.append(pos)
+            pos += CENTRAL.size + len(self.name(index))
+            pos += len(self.central_extra(index))
+        self.end_offset = pos
+        self.length = pos + len(self.end())
+
+        self.pos = 0
+        self._file = None
+        self._file_index = -1
+        self._crc = 0
+        self._crc_done = 0
+
+    def name(self, index: int) -> bytes:
+        return self.base + self.rels[self.starts[index] : self.starts[index + 1]]
+
+    def path(self, index: int) -> str:
+        rel = self.rels[self.starts[index] : self.starts[index + 1]].decode()
+        return os.path.join(self.root, rel)
+
+    def time(self, index: int) -> tuple:
+        return self.times[2 * index], self.times[2 * index + 1]
+
+    def etag(self) -> str:
+        # the same for the same names, sizes and times, known crcs or not
+        digest = hashlib.sha1()
+        for index in range(self.count):
+            digest.update(self.name(index) + b"\0")
+            digest.update(struct.pack("<QHH", self.sizes[index], *self.time(index)))
+        return digest.hexdigest()
+
+    def is_zip64(self, index: int) -> bool:
+        return self.sizes[index] >= LIMIT
+
+    def local_size(self, index: int) -> int:
+        extra = EXTRA64.size + 16 if self.is_zip64(index) else 0
+        name = len(self.base) + self.starts[index + 1] - self.starts[index]
+        return LOCAL.size + name + extra
+
+    def descriptor_size(self, index: int) -> int:
+        return DESCRIPTOR64.size if self.is_zip64(index) else DESCRIPTOR.size
+
+    def local(self, index: int) -> bytes:
+        size, name = self.sizes[index], self.name(index)
+        extra = b""
+        if self.is_zip64(index):
+            extra = EXTRA64.pack(1, 16) + struct.pack("<QQ", size, size)
+            size = LIMIT
+        header = LOCAL.pack(
+            0x04034B50,
+            45 if extra else 20,
+            UTF8 | DESCRIPTOR_FLAG,
+            0,
+            *self.time(index),
+            0,
+            size,
+            size,
+            len(name),
+            len(extra),
+        )
+        return header + name + extra
+
+    def descriptor(self, index: int) -> bytes:
+        size = self.sizes[index]
+        if self.is_zip64(index):
+            return DESCRIPTOR64.pack(0x08074B50, self.crcs[index], size, size)
+        return DESCRIPTOR.pack(0x08074B50, self.crcs[index], size, size)
+
+    def central_extra(self, index: int) -> bytes:
+        size = self.sizes[index]
+        return central_extra(size, size, self.offsets[index])
+
+    def central(self, index: int) -> bytes:
+        size = self.sizes[index]
+        return central(
+            self.name(index),
+            self.time(index),
+            self.crcs[index],
+            size,
+            size,
+            self.offsets[index],
+            flags=UTF8 | DESCRIPTOR_FLAG,
+        )
+
+    def end(self) -> bytes:
+        return end(
+            self.count, self.central_offset, self.end_offset - self.central_offset
+        )
+
+    def chunk(self, pos: int, size: int) -> bytes:
+        # the bytes from pos up to the end of the part holding pos
+        if pos >= self.end_offset:
+            return self.end()[pos - self.end_offset :][:size]
+        if pos >= self.central_offset:
+            index = bisect.bisect_right(self.central_offsets, pos) - 1
+            start = pos - self.central_offsets[index]
+            return self.central(index)[start : start + size]
+
+        index = bisect.bisect_right(self.offsets, pos) - 1
+        start = pos - self.offsets[index]
+        header = self.local_size(index)
+        if start < header:
+            return self.local(index)[start : start + size]
+        start -= header
+        if start < self.sizes[index]:
+            return self.data(index, start, min(size, self.sizes[index] - start))
+        start -= self.sizes[index]
+        return self.descriptor(index)[start : start + size]
+
+    def data(self, index: int, start: int, size: int) -> bytes:
+        if self._file_index != index:
+            self.close_file()
+            self._file = open(self.path(index), "rb")
+            self._file_index = index
+            self._crc = self._crc_done = 0
+        self._file.seek(start)
+        data = self._file.read(size)
+        if len(data) != size:
+            raise OSError(f"{self.path(index)} changed while it was zipped")
+
+        if not self.known and start == self._crc_done:
+            # members read in order have their crc computed on the way
+            self._crc = zlib.crc32(data, self._crc)
+            self._crc_done += size
+            if self._crc_done == self.sizes[index]:
+                self.crcs[index] = self._crc
+        return data
+
+    def close_file(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+            self._file_index = -1
+
+    def readinto(self, buffer) -> int:
+        # fills the buffer across the parts, short only at the end
+        size = min(len(buffer), self.length - self.pos)
+        done = 0
+        while done < size:
+            data = self.chunk(self.pos, size - done)
+            buffer[done : done + len(data)] = data
+            self.pos += len(data)
+            done += len(data)
+        return done
+
+    def seek(self, pos: int, whence: int = 0) -> int:
+        if whence == 1:
+            pos += self.pos
+        elif whence == 2:
+            pos += self.length
+        self.pos = max(pos, 0)
+        return self.pos
+
+    def tell(self) -> int:
+        return self.pos
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        # without known crcs the stream has to be read in order
+        return self.known
+
+    def close(self):
+        self.close_file()
+        super().close()
@@ -0,0 +1,129 @@
+# MIT License
+
+# Copyright (c) 2022 Apata Miracle Peter
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os, zlib, shutil, struct, tempfile
+from zipstream import LOCAL, EXTRA64, LIMIT, UTF8, dos_time, central, end
+
+CHUNK = 1024 * 1024
+DEFLATED = 8
+
+
+class ZipWriter:
+    # writes a deflated zip while holding nothing per member: each central
+    # directory record is appended to a spool that moves to a temporary file
+    # past `spool` bytes, and is copied after the members on close.
+    # zipfile.ZipFile keeps a ZipInfo per member until it is closed
+    def __init__(self, path: str, level: int = 9, spool: int = 8 * 1024 * 1024):
+        self.level = level
+        self.count = 0
+        self._file = open(path, "wb")
+        self._central = tempfile.SpooledTemporaryFile(spool)
+
+    def write(self, path: str, arcname: str, st: os.stat_result = None):
+        st = st or os.stat(path)
+        name = arcname.encode()
+        times = dos_time(st.st_mtime)
+        offset = self._file.tell()
+        # deflate can grow incompressible data a little
+        zip64 = st.st_size * 1.05 >= LIMIT
+
+        extra = EXTRA64.pack(1, 16) + bytes(16) if zip64 else b""
+        size = LIMIT if zip64 else 0
+        self._file.write(
+            LOCAL.pack(
+                0x04034B50,
+                45 if zip64 else 20,
+                UTF8,
+                DEFLATED,
+                *times,
+                0,
+                size,
+                size,
+                len(name),
+                len(extra),
+            )
+            + name
+            + extra
+        )
+
+        crc = size = compressed = 0
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        with open(path, "rb") as source:
+            for chunk in iter(lambda: source.read(CHUNK), b""):
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                data = compressor.compress(chunk)
+                compressed += len(data)
+                self._file.write(data)
+        data = compressor.flush()
+        compressed += len(data)
+        self._file.write(data)
+        if not zip64 and max(size, compressed) >= LIMIT:
+            raise OSError(f"{path} grew over 4 GB while it was zipped")
+
+        # the crc and sizes are only known now
+        end_offset = self._file.tell()
+        if zip64:
+            self._file.seek(offset + 14)
+            self._file.write(struct.pack("<I", crc))
+            self._file.seek(offset + LOCAL.size + len(name) + EXTRA64.size)
+            self._file.write(struct.pack("<QQ", size, compressed))
+        else:
+            self._file.seek(offset + 14)
+            self._file.write(struct.pack("<III", crc, compressed, size))
+        self._file.seek(end_offset)
+
+        self._central.write(
+            central(
+                name,
+                times,
+                crc,
+                compressed,
+                size,
+                offset,
+                DEFLATED,
+                mode=st.st_mode & 0xFFFF,
+            )
+        )
+        self.count += 1
+
+    def close(self):
+        offset = self._file.tell()
+        self._central.seek(0)
+        shutil.copyfileobj(self._central, self._file, CHUNK)
+        size = self._file.tell() - offset
+        self._file.write(end(self.count, offset, size))
+        self._central.close()
+        self._file.close()
+
+    def abort(self):
+        self._central.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, *exc):
+        if kind:
+            self.abort()
+        else:
+            self.close()